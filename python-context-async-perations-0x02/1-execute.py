@@ -1,5 +1,8 @@
 import sqlite3
-from typing import List, Tuple, Any
+import sys
+import threading
+import time
+from typing import Any, Callable, Iterator, List, Tuple
 
 #!/usr/bin/env python3
 """
@@ -7,66 +10,189 @@ Module for a context manager that executes a query
 """
 
 
+def demo_database() -> sqlite3.Connection:
+    """
+    Connection source for the demo: an in-memory database with a
+    users table and some sample data.
+    """
+    connection = sqlite3.connect(":memory:")
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            age INTEGER
+        )
+    """)
+    sample_data = [
+        (1, "Alice", 22),
+        (2, "Bob", 30),
+        (3, "Charlie", 28),
+        (4, "David", 20)
+    ]
+    connection.executemany(
+        "INSERT OR IGNORE INTO users VALUES (?, ?, ?)",
+        sample_data
+    )
+    connection.commit()
+    return connection
+
+
+class QueryExecutor:
+    """
+    A long-lived query executor.
+
+    The connection is taken from `connection_source` (any callable that
+    returns a DB-API connection) on first use and kept open, so setup runs
+    once rather than on every query. sqlite3 keeps a cache of prepared
+    statements per connection keyed by the SQL text, so running the same
+    parameterised query again reuses its compiled statement and only
+    binds the new parameters.
+
+    Like the connection it wraps, an executor is meant for a single thread.
+    """
+
+    def __init__(self, connection_source: Callable[[], Any] = demo_database):
+        self.connection_source = connection_source
+        self.connection = None
+
+    def _connection(self):
+        if self.connection is None:
+            self.connection = self.connection_source()
+        return self.connection
+
+    def execute(self, query: str, params=()) -> List[Tuple]:
+        """Runs a query and returns all its rows."""
+        cursor = self._connection().execute(query, params)
+        try:
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def stream(self, query: str, params=(), batch_size: int = 500) -> Iterator[Tuple]:
+        """
+        Runs a query and yields its rows lazily, fetching `batch_size`
+        rows at a time. Closing the generator closes the cursor.
+        """
+        cursor = self._connection().execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+    def close(self):
+        """Closes the connection; the next query opens a new one."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+# Executors used by ExecuteQuery when none is given, one per thread since
+# a sqlite3 connection only works on the thread that created it
+_default_executors = threading.local()
+
+
+def default_executor() -> QueryExecutor:
+    """Returns the calling thread's executor over the demo database."""
+    executor = getattr(_default_executors, 'executor', None)
+    if executor is None:
+        executor = _default_executors.executor = QueryExecutor()
+    return executor
+
+
 class ExecuteQuery:
     """
     A context manager for executing SQL queries.
     """
 
-    def __init__(self, query: str, params=None):
+    def __init__(self, query: str, params=None, executor: QueryExecutor = None,
+                 stream: bool = False, batch_size: int = 500):
         """
         Initialize the ExecuteQuery context manager.
 
         Args:
             query: The SQL query to execute
-            params: Parameters to use with the query
+            params: Parameters to use with the query (a single value is
+                treated as the only parameter)
+            executor: QueryExecutor to run the query on; defaults to the
+                calling thread's executor over the demo database
+            stream: Return an iterator over the rows instead of a list
+            batch_size: Rows fetched at a time when streaming
         """
+        if params is None:
+            params = ()
+        elif not isinstance(params, (list, tuple, dict)):
+            params = (params,)
         self.query = query
-        self.params = params if params is not None else []
-        self.connection = None
-        self.cursor = None
+        self.params = params
+        self.executor = executor
+        self.stream = stream
+        self.batch_size = batch_size
         self.result = None
 
     def __enter__(self):
         """
-        Set up the database connection and execute the query.
-        Returns the query result.
+        Execute the query on the executor.
+        Returns the query result, or a row iterator when streaming.
         """
-        self.connection = sqlite3.connect(":memory:")  # In-memory database for demo
-        self.cursor = self.connection.cursor()
-        
-        # For demo purposes, create a users table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY,
-                name TEXT,
-                age INTEGER
-            )
-        """)
-        
-        # Insert some sample data
-        sample_data = [
-            (1, "Alice", 22),
-            (2, "Bob", 30),
-            (3, "Charlie", 28),
-            (4, "David", 20)
-        ]
-        self.cursor.executemany(
-            "INSERT OR IGNORE INTO users VALUES (?, ?, ?)", 
-            sample_data
-        )
-        
-        # Execute the actual query
-        self.cursor.execute(self.query, self.params)
-        self.result = self.cursor.fetchall()
-        
+        executor = self.executor or default_executor()
+        if self.stream:
+            self.result = executor.stream(self.query, self.params,
+                                          self.batch_size)
+        else:
+            self.result = executor.execute(self.query, self.params)
         return self.result
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
-        Clean up resources.
+        Clean up resources. The executor and its connection stay open
+        for the next query; a partly consumed stream is closed.
         """
-        if self.cursor:
-            self.cursor.close()
-        if self.connection:
-            self.connection.close()
+        if self.stream and self.result is not None:
+            self.result.close()
         return False  # Don't suppress exceptions
+
+
+def benchmark(runs: int = 20_000):
+    """
+    Compares repeated parameterised queries on a shared executor with
+    setting up a fresh database for every query, as ExecuteQuery used to.
+    """
+    query = "SELECT * FROM users WHERE age > ?"
+
+    start = time.perf_counter()
+    for i in range(runs):
+        with QueryExecutor() as executor:
+            executor.execute(query, (i % 30,))
+    fresh = runs / (time.perf_counter() - start)
+
+    executor = QueryExecutor()
+    start = time.perf_counter()
+    for i in range(runs):
+        with ExecuteQuery(query, i % 30, executor=executor):
+            pass
+    shared = runs / (time.perf_counter() - start)
+    executor.close()
+
+    print(f"setup per query: {fresh:,.0f} queries/sec")
+    print(f"shared executor: {shared:,.0f} queries/sec")
+
+
+if __name__ == "__main__" and sys.argv[1:] == ["benchmark"]:
+    benchmark()
+elif __name__ == "__main__":
+    with ExecuteQuery("SELECT * FROM users WHERE age > ?", 25) as result:
+        print(result)
+    with ExecuteQuery("SELECT * FROM users WHERE age > ?", 25, stream=True) as rows:
+        for row in rows:
+            print(row)
@@ -1,5 +1,10 @@
 import asyncio
 import aiosqlite
+from contextlib import aclosing
+from async_pool import AsyncConnectionPool
+from async_stream import stream
+from shared_scan import SharedScan
+from task_runner import run_tasks
 
 #!/usr/bin/env python3
 """
@@ -7,44 +12,90 @@ Concurrent database operations using asyncio.gather
 """
 
 
-async def async_fetch_users():
+async def async_fetch_users(pool=None, scan=None):
     """
     Fetches all users from the database asynchronously.
+    Joins a shared `scan` when given, else uses a reader from `pool`,
+    else its own connection.
     
     Returns:
         list: A list of user records
     """
+    if scan is not None:
+        return await scan.select('users')
+    if pool is not None:
+        async with pool.reader() as db:
+            async with db.execute('SELECT * FROM users') as cursor:
+                return await cursor.fetchall()
     async with aiosqlite.connect('users.db') as db:
         db.row_factory = aiosqlite.Row
         async with db.execute('SELECT * FROM users') as cursor:
             return await cursor.fetchall()
 
 
-async def async_fetch_older_users():
+async def async_fetch_older_users(pool=None, scan=None):
     """
     Fetches users older than 40 from the database asynchronously.
+    Joins a shared `scan` when given, else uses a reader from `pool`,
+    else its own connection.
     
     Returns:
         list: A list of user records where age > 40
     """
+    if scan is not None:
+        return await scan.select('users',
+                                 lambda row: row['age'] is not None and row['age'] > 40)
+    if pool is not None:
+        async with pool.reader() as db:
+            async with db.execute('SELECT * FROM users WHERE age > 40') as cursor:
+                return await cursor.fetchall()
     async with aiosqlite.connect('users.db') as db:
         db.row_factory = aiosqlite.Row
         async with db.execute('SELECT * FROM users WHERE age > 40') as cursor:
             return await cursor.fetchall()
 
 
-async def fetch_concurrently():
+async def async_stream_users(pool, batch_size=500, limiter=None):
     """
-    Runs both database queries concurrently using asyncio.gather.
+    Streams all users in batches instead of loading the whole table.
+
+    Yields:
+        list: Up to batch_size user records at a time
+    """
+    # aclosing releases the cursor, reader and limiter slot as soon as
+    # this generator is closed, not when the inner one is collected
+    async with aclosing(stream(pool, 'SELECT * FROM users',
+                               batch_size=batch_size, limiter=limiter)) as batches:
+        async for batch in batches:
+            yield batch
+
+
+async def fetch_concurrently(timeout=30.0):
+    """
+    Runs both database queries concurrently with the task runner,
+    sharing one connection pool between them. Both read the users table,
+    so they are fused into a single shared scan. If either query fails
+    or takes longer than `timeout` seconds, the other is cancelled and
+    the error is raised, as asyncio.gather would.
     
     Returns:
         tuple: A tuple containing the results of both queries
     """
-    results = await asyncio.gather(
-        async_fetch_users(),
-        async_fetch_older_users()
-    )
+    async with AsyncConnectionPool('users.db', row_factory=aiosqlite.Row) as pool:
+        scan = SharedScan(pool)
+        queries = [
+            ('all_users', async_fetch_users(scan=scan)),
+            ('older_users', async_fetch_older_users(scan=scan)),
+        ]
+        values = {}
+        async with aclosing(run_tasks(queries, max_in_flight=len(queries),
+                                      timeout=timeout, fatal=Exception)) as results:
+            async for result in results:
+                if result.status == 'timeout':
+                    raise result.error
+                values[result.name] = result.value
     
+    results = (values['all_users'], values['older_users'])
     all_users, older_users = results
     
     print(f"Total users: {len(all_users)}")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Async SQLite connection pool shared by asyncio.gather fan-outs
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+
+class AsyncConnectionPool:
+    """
+    A pool of aiosqlite connections split into readers and one writer.
+
+    Every aiosqlite connection runs on its own thread, so connecting per
+    coroutine starts one thread per query. The pool keeps at most `readers`
+    read connections open, and a bounded semaphore makes further readers
+    wait for a free one. The database is switched to WAL mode so those
+    readers never block on, or block, the single writer; writes are
+    serialised through the writer connection because SQLite allows only
+    one writer at a time anyway.
+
+        async with AsyncConnectionPool('users.db') as pool:
+            async with pool.reader() as db:
+                ...
+    """
+
+    def __init__(self, database, readers=4, row_factory=None):
+        if readers < 1:
+            raise ValueError("A pool needs at least one reader")
+        self.database = database
+        self.readers = readers
+        self.row_factory = row_factory
+        self._idle = []
+        self._opened = []
+        self._semaphore = asyncio.BoundedSemaphore(readers)
+        self._writer = None
+        self._writer_lock = asyncio.Lock()
+        self._closed = False
+
+    async def _connect(self, read_only):
+        connection = await aiosqlite.connect(self.database)
+        if self.row_factory is not None:
+            connection.row_factory = self.row_factory
+        if read_only:
+            await connection.execute("PRAGMA query_only=ON")
+        self._opened.append(connection)
+        return connection
+
+    async def open(self):
+        """Opens the writer connection and switches the database to WAL."""
+        if self._writer is None:
+            self._writer = await self._connect(read_only=False)
+            await self._writer.execute("PRAGMA journal_mode=WAL")
+            await self._writer.execute("PRAGMA synchronous=NORMAL")
+        return self
+
+    @asynccontextmanager
+    async def reader(self):
+        """Borrows a read-only connection, waiting when all are in use."""
+        async with self._semaphore:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            if self._idle:
+                connection = self._idle.pop()
+            else:
+                connection = await self._connect(read_only=True)
+            try:
+                yield connection
+            finally:
+                if connection.in_transaction:
+                    await connection.rollback()
+                self._idle.append(connection)
+
+    @asynccontextmanager
+    async def writer(self):
+        """
+        Borrows the writer connection, one coroutine at a time. Anything
+        left uncommitted is rolled back when the block exits.
+        """
+        async with self._writer_lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            await self.open()
+            try:
+                yield self._writer
+            finally:
+                if self._writer.in_transaction:
+                    await self._writer.rollback()
+
+    async def close(self):
+        """Closes every connection the pool opened."""
+        self._closed = True
+        for connection in self._opened:
+            await connection.close()
+        self._opened = []
+        self._idle = []
+        self._writer = None
+
+    @property
+    def stats(self):
+        return {'connections': len(self._opened), 'idle_readers': len(self._idle)}
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        return False
+
+
+def _create_benchmark_database(database, rows):
+    import sqlite3
+    with sqlite3.connect(database) as conn:
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "name TEXT, email TEXT, age INTEGER)")
+        conn.executemany(
+            "INSERT INTO users VALUES (?, ?, ?, ?)",
+            ((i, f"user{i}", f"user{i}@example.com", 20 + i % 50)
+             for i in range(1, rows + 1)))
+    conn.close()
+
+
+async def benchmark(queries=1000, readers=4, rows=10_000):
+    """
+    Runs `queries` small concurrent queries with asyncio.gather, first
+    connecting per coroutine and then sharing a pool.
+    """
+    query = "SELECT * FROM users WHERE id = ?"
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'users.db')
+        _create_benchmark_database(database, rows)
+
+        async def connect_per_coroutine(user_id):
+            async with aiosqlite.connect(database) as db:
+                async with db.execute(query, (user_id,)) as cursor:
+                    return await cursor.fetchone()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(connect_per_coroutine(i % rows + 1)
+                               for i in range(queries)))
+        unpooled = time.perf_counter() - start
+
+        async with AsyncConnectionPool(database, readers) as pool:
+            async def pooled(user_id):
+                async with pool.reader() as db:
+                    async with db.execute(query, (user_id,)) as cursor:
+                        return await cursor.fetchone()
+
+            start = time.perf_counter()
+            await asyncio.gather(*(pooled(i % rows + 1) for i in range(queries)))
+            shared = time.perf_counter() - start
+            connections = pool.stats['connections']
+
+    print(f"connect per coroutine: {queries / unpooled:,.0f} queries/sec "
+          f"({queries} connections)")
+    print(f"{'pooled':>21}: {queries / shared:,.0f} queries/sec "
+          f"({connections} connections)")
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark(*map(int, sys.argv[1:])))
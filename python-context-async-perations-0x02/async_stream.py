@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Streaming aiosqlite queries as async generators of row batches
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+
+from async_pool import AsyncConnectionPool, _create_benchmark_database
+
+
+class StreamLimiter:
+    """
+    Caps how many streams may be open at once. A stream holds its slot
+    (and, on a pool, a reader connection) until it is exhausted or
+    closed; later streams wait their turn in arrival order. Keeping the
+    cap below the pool's reader count leaves readers free for short
+    queries while long streams run.
+    """
+
+    def __init__(self, max_streams=2):
+        self.max_streams = max_streams
+        self._semaphore = asyncio.Semaphore(max_streams)
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+@asynccontextmanager
+async def _borrow(source):
+    """Yields a connection from a pool, or the given connection itself."""
+    if isinstance(source, AsyncConnectionPool):
+        async with source.reader() as db:
+            yield db
+    else:
+        yield source
+
+
+@asynccontextmanager
+async def _no_limit():
+    yield
+
+
+async def stream(source, query, params=(), batch_size=500, limiter=None):
+    """
+    Runs `query` and yields its rows in lists of up to `batch_size`, so
+    only one batch is held in memory at a time.
+
+    `source` is an AsyncConnectionPool or an open aiosqlite connection.
+    The cursor is closed as soon as the stream ends, raises or is
+    cancelled while waiting for a batch. When the consumer stops early,
+    close the generator (e.g. with contextlib.aclosing) to release the
+    cursor and connection straight away rather than at garbage collection:
+
+        async with aclosing(stream(pool, query)) as batches:
+            async for batch in batches:
+                ...
+    """
+    limit = limiter.slot() if limiter is not None else _no_limit()
+    async with limit, _borrow(source) as db:
+        cursor = await db.execute(query, params)
+        try:
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            await cursor.close()
+
+
+async def benchmark(rows=200_000, batch_size=1000):
+    """
+    Compares fetchall() with streaming on peak memory and time to the
+    first row, then shows a cancelled stream releasing its reader.
+    """
+    query = "SELECT * FROM users"
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'users.db')
+        _create_benchmark_database(database, rows)
+        async with AsyncConnectionPool(database, readers=2) as pool:
+            tracemalloc.start()
+            start = time.perf_counter()
+            async with pool.reader() as db:
+                async with db.execute(query) as cursor:
+                    everything = await cursor.fetchall()
+            first = time.perf_counter() - start
+            count = len(everything)
+            del everything
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"fetchall: first row after {first * 1000:.1f} ms, "
+                  f"peak {peak / 2 ** 20:.1f} MiB, {count} rows")
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            first = None
+            count = 0
+            async for batch in stream(pool, query, batch_size=batch_size):
+                if first is None:
+                    first = time.perf_counter() - start
+                count += len(batch)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  stream: first row after {first * 1000:.1f} ms, "
+                  f"peak {peak / 2 ** 20:.1f} MiB, {count} rows")
+
+            async def consume():
+                async for _ in stream(pool, query, batch_size=10):
+                    await asyncio.sleep(0)
+
+            task = asyncio.ensure_future(consume())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            print(f"cancelled stream: {pool.stats['idle_readers']} of "
+                  f"{pool.stats['connections'] - 1} readers idle again")
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark(*map(int, sys.argv[1:])))
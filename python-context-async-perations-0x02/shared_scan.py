@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Shared-scan fusion of concurrent reads on the same table
+"""
+import asyncio
+import os
+import re
+import sys
+import tempfile
+import time
+
+import aiosqlite
+
+from async_pool import AsyncConnectionPool, _create_benchmark_database
+
+IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class SharedScan:
+    """
+    Fuses overlapping reads of a table into a single scan.
+
+    The first select() on a table opens a short `window`; every select() on
+    the same table that arrives in that window joins it. When the window
+    closes, one `SELECT * FROM table` runs on a reader from `pool` and each
+    row is handed to every waiter whose predicate accepts it, so N
+    concurrent queries cost one pass over the table instead of N.
+
+        scan = SharedScan(pool)
+        everyone, older = await asyncio.gather(
+            scan.select('users'),
+            scan.select('users',
+                        lambda row: row['age'] is not None and row['age'] > 40),
+        )
+
+    Predicates receive rows as produced by the pool's row_factory and run
+    on the event loop, so they should be cheap. They also see NULLs as None:
+    where SQL's `WHERE age > 40` quietly skips a NULL age, `row['age'] > 40`
+    raises TypeError, so predicates must test for None themselves. An
+    exception raised by a predicate fails only the select() it belongs to;
+    only a failing scan fails every query in the batch.
+    """
+
+    def __init__(self, pool, window=0.002, batch_size=1000):
+        self.pool = pool
+        self.window = window
+        self.batch_size = batch_size
+        self.scans = 0
+        self.queries = 0
+        self._pending = {}  # table -> [(predicate, future)]
+        self._tasks = set()
+
+    async def select(self, table, predicate=None):
+        """Returns the rows of `table` accepted by `predicate` (all if None)."""
+        if not IDENTIFIER.match(table):
+            raise ValueError(f"Invalid table name: {table}")
+        future = asyncio.get_running_loop().create_future()
+        waiters = self._pending.get(table)
+        if waiters is None:
+            waiters = self._pending[table] = []
+            task = asyncio.ensure_future(self._scan_after_window(table))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        waiters.append((predicate, future))
+        self.queries += 1
+        return await future
+
+    async def _scan_after_window(self, table):
+        await asyncio.sleep(self.window)
+        waiters = self._pending.pop(table)
+        waiters = [(predicate, future, [])
+                   for predicate, future in waiters if not future.done()]
+        if not waiters:
+            return
+        self.scans += 1
+        try:
+            async with self.pool.reader() as db:
+                async with db.execute(f"SELECT * FROM {table}") as cursor:
+                    while True:
+                        rows = await cursor.fetchmany(self.batch_size)
+                        if not rows:
+                            break
+                        for predicate, future, results in waiters:
+                            if future.done():  # cancelled or failed meanwhile
+                                continue
+                            if predicate is None:
+                                results.extend(rows)
+                                continue
+                            try:
+                                results.extend(filter(predicate, rows))
+                            except Exception as exc:
+                                # A broken predicate fails only its own query
+                                future.set_exception(exc)
+        except Exception as exc:
+            # The scan itself failed, so every query in the batch fails with it
+            for _, future, _ in waiters:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for _, future, results in waiters:
+            if not future.done():
+                future.set_result(results)
+
+    @property
+    def stats(self):
+        return {'queries': self.queries, 'scans': self.scans}
+
+
+async def benchmark(widgets=8, rounds=20, rows=100_000):
+    """
+    Simulates a dashboard firing `widgets` overlapping reads of the users
+    table at once, `rounds` times, with and without shared scans.
+    """
+    def older_than(age):
+        return lambda row: row['age'] is not None and row['age'] > age
+
+    predicates = [(f"age > {20 + 5 * i}", older_than(20 + 5 * i))
+                  for i in range(widgets)]
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'users.db')
+        _create_benchmark_database(database, rows)
+        async with AsyncConnectionPool(database, widgets,
+                                       row_factory=aiosqlite.Row) as pool:
+            async def separate(condition):
+                async with pool.reader() as db:
+                    async with db.execute(
+                            f"SELECT * FROM users WHERE {condition}") as cursor:
+                        return await cursor.fetchall()
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                expected = await asyncio.gather(
+                    *(separate(condition) for condition, _ in predicates))
+            unfused = time.perf_counter() - start
+
+            scan = SharedScan(pool)
+            start = time.perf_counter()
+            for _ in range(rounds):
+                fused = await asyncio.gather(
+                    *(scan.select('users', predicate) for _, predicate in predicates))
+            shared = time.perf_counter() - start
+
+    assert [len(r) for r in fused] == [len(r) for r in expected]
+    print(f"separate queries: {rounds / unfused:.1f} dashboards/sec, "
+          f"{rounds * widgets} scans")
+    print(f"    shared scans: {rounds / shared:.1f} dashboards/sec, "
+          f"{scan.stats['scans']} scans")
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark(*map(int, sys.argv[1:])))
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Concurrency-limited runner for large fan-outs of query coroutines
+"""
+import asyncio
+import inspect
+import os
+import sys
+import tempfile
+import time
+
+from async_pool import AsyncConnectionPool, _create_benchmark_database
+
+
+class TaskResult:
+    """
+    Outcome of one query: status is 'ok', 'error' or 'timeout'.
+    latency is the seconds from the task starting to it finishing, so
+    time spent queued behind max_in_flight is not counted.
+    """
+    __slots__ = ('name', 'status', 'value', 'error', 'latency')
+
+    def __init__(self, name, status, value=None, error=None, latency=0.0):
+        self.name = name
+        self.status = status
+        self.value = value
+        self.error = error
+        self.latency = latency
+
+    def __repr__(self):
+        return (f"TaskResult({self.name!r}, {self.status!r}, "
+                f"latency={self.latency * 1000:.1f}ms)")
+
+
+def _is_fatal(fatal, exc):
+    """Applies a fatal setting: None, exception class(es) or a predicate."""
+    if fatal is None:
+        return False
+    if isinstance(fatal, type) or isinstance(fatal, tuple):
+        return isinstance(exc, fatal)
+    return fatal(exc)
+
+
+async def _timed(name, coroutine, timeout):
+    started = time.perf_counter()
+    try:
+        value = await asyncio.wait_for(coroutine, timeout)
+        status, error = 'ok', None
+    except asyncio.TimeoutError as exc:
+        value, status, error = None, 'timeout', exc
+    except Exception as exc:
+        value, status, error = None, 'error', exc
+    return TaskResult(name, status, value, error,
+                      time.perf_counter() - started)
+
+
+async def run_tasks(queries, max_in_flight=10, timeout=None, fatal=None):
+    """
+    Runs query coroutines with at most `max_in_flight` running at once and
+    yields a TaskResult for each as it completes.
+
+    `queries` yields coroutines or (name, coroutine) pairs; unnamed ones
+    are named by position. It is consumed lazily, so a generator
+    expression never creates more than max_in_flight coroutines at a time
+    even for thousands of queries. Each task gets `timeout` seconds (None
+    for no limit); a timed-out task yields a 'timeout' result and the
+    others carry on.
+
+    Failures are reported as 'error' results. If a failure matches
+    `fatal` (exception class(es) or a predicate), its result is yielded,
+    every other running task is cancelled and the exception is raised.
+    Closing the generator early also cancels whatever is still running.
+    """
+    pending = iter(queries)
+    running = set()
+    index = 0
+
+    def start_next():
+        nonlocal index
+        item = next(pending, None)
+        if item is None:
+            return False
+        if inspect.iscoroutine(item):
+            name, coroutine = index, item
+        else:
+            name, coroutine = item
+        index += 1
+        running.add(asyncio.ensure_future(_timed(name, coroutine, timeout)))
+        return True
+
+    try:
+        while len(running) < max_in_flight and start_next():
+            pass
+        while running:
+            done, _ = await asyncio.wait(running,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                running.discard(task)
+                result = task.result()
+                yield result
+                if result.status == 'error' and _is_fatal(fatal, result.error):
+                    raise result.error
+                if len(running) < max_in_flight:
+                    start_next()
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        if isinstance(queries, (list, tuple)):
+            # Close coroutines that were never started so they don't warn
+            for item in pending:
+                coroutine = item if inspect.iscoroutine(item) else item[1]
+                coroutine.close()
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_report(results):
+    """Summarises a list of TaskResults: counts by status and latencies."""
+    latencies = sorted(result.latency for result in results)
+    report = {'tasks': len(results)}
+    for status in ('ok', 'error', 'timeout'):
+        report[status] = sum(1 for result in results if result.status == status)
+    if latencies:
+        report.update({
+            'p50_ms': _percentile(latencies, 0.50) * 1000,
+            'p95_ms': _percentile(latencies, 0.95) * 1000,
+            'p99_ms': _percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000,
+        })
+    return report
+
+
+async def benchmark(queries=5000, readers=8, rows=10_000):
+    """
+    Runs `queries` point queries through a pool of `readers` connections
+    at several max_in_flight settings and prints throughput and latency.
+    """
+    query = "SELECT * FROM users WHERE id = ?"
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'users.db')
+        _create_benchmark_database(database, rows)
+        async with AsyncConnectionPool(database, readers) as pool:
+            async def fetch(user_id):
+                async with pool.reader() as db:
+                    async with db.execute(query, (user_id,)) as cursor:
+                        return await cursor.fetchone()
+
+            for max_in_flight in (1, readers, 10 * readers, queries):
+                start = time.perf_counter()
+                results = [result async for result in run_tasks(
+                    (fetch(i % rows + 1) for i in range(queries)),
+                    max_in_flight=max_in_flight, timeout=5.0)]
+                elapsed = time.perf_counter() - start
+                report = latency_report(results)
+                print(f"max_in_flight={max_in_flight:>5}: "
+                      f"{queries / elapsed:>7,.0f} queries/sec, "
+                      f"p50 {report['p50_ms']:.2f} ms, "
+                      f"p99 {report['p99_ms']:.2f} ms, "
+                      f"{report['timeout']} timeouts")
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark(*map(int, sys.argv[1:])))
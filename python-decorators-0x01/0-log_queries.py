@@ -1,43 +1,408 @@
 import sqlite3
 import functools
-from datetime import datetime
+import atexit
+import itertools
+import json
+import logging
+import math
+import queue
+import re
+import sys
+import threading
+import time
+from logging.handlers import QueueListener
 
-def log_queries(func):
+# Matches strings that start with a SQL statement keyword
+_SQL_START = re.compile(r'\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b', re.IGNORECASE)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+logger = logging.getLogger('queries')
+logger.propagate = False
+_records = queue.SimpleQueue()
+_listener = None
+_report_at_exit = False
+
+
+class Histogram:
+    """
+    Log-bucketed histogram: each bucket is `growth` times wider than the one
+    before, so percentiles are accurate to about half of (growth - 1)
+    whatever the range of values.
+    """
+
+    def __init__(self, growth=1.2):
+        self._log_growth = math.log(growth)
+        self.growth = growth
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        index = (-math.inf if value <= 0
+                 else math.floor(math.log(value) / self._log_growth))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        """Returns the midpoint of the bucket holding the p-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                if index == -math.inf:
+                    return 0.0
+                low = self.growth ** index
+                return min((low + low * self.growth) / 2, self.max)
+        return self.max
+
+
+class FingerprintStats:
+    """Aggregated calls, latency and row counts for one query fingerprint."""
+
+    def __init__(self, query):
+        self.example = query
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram()
+        self.rows = Histogram()
+        self.plan = None
+
+
+class QueryProfiler:
+    """
+    Collects per-fingerprint statistics from profiled log_queries calls and
+    renders them as a report sorted by total time (or another column).
+    Query plans are captured with EXPLAIN QUERY PLAN the first time a
+    fingerprint runs slower than the decorator's explain_ms.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._connections = {}
+
+    def record(self, key, query, duration_ms, rows, error):
+        with self._lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = FingerprintStats(query)
+            stats.calls += 1
+            stats.latency.add(duration_ms)
+            if rows is not None:
+                stats.rows.add(rows)
+            if error:
+                stats.errors += 1
+            return stats
+
+    def needs_plan(self, key):
+        stats = self.stats.get(key)
+        return stats is None or stats.plan is None
+
+    def set_plan(self, key, plan):
+        with self._lock:
+            if key in self.stats and plan is not None:
+                self.stats[key].plan = plan
+
+    def explain(self, database, query):
+        """Runs EXPLAIN QUERY PLAN on the profiler's own connection."""
+        connection = self._connections.get(database)
+        if connection is None:
+            connection = self._connections[database] = \
+                sqlite3.connect(database, check_same_thread=False)
+        return explain(connection, query)
+
+    def report(self, sort_by='total', limit=20):
+        """
+        Returns the report as text. sort_by is one of 'total', 'calls',
+        'p50', 'p95', 'p99' or 'rows'. Queued records are handled first.
+        """
+        _flush()
+        keys = {
+            'total': lambda s: s.latency.total,
+            'calls': lambda s: s.calls,
+            'p50': lambda s: s.latency.percentile(50),
+            'p95': lambda s: s.latency.percentile(95),
+            'p99': lambda s: s.latency.percentile(99),
+            'rows': lambda s: s.rows.total,
+        }
+        with self._lock:
+            ranked = sorted(self.stats.items(),
+                            key=lambda item: keys[sort_by](item[1]),
+                            reverse=True)[:limit]
+            lines = [f"{'calls':>7} {'errors':>6} {'total ms':>10} "
+                     f"{'p50':>8} {'p95':>8} {'p99':>8} {'rows p50':>8}  query"]
+            for key, stats in ranked:
+                latency = stats.latency
+                lines.append(
+                    f"{stats.calls:>7} {stats.errors:>6} {latency.total:>10.2f} "
+                    f"{latency.percentile(50):>8.2f} {latency.percentile(95):>8.2f} "
+                    f"{latency.percentile(99):>8.2f} {stats.rows.percentile(50):>8.0f}"
+                    f"  {key}")
+                if stats.plan:
+                    lines.extend(f"{'':>62}plan: {step}" for step in stats.plan)
+        return "\n".join(lines)
+
+    def dump(self, file=None, **options):
+        """Writes the report to `file` (stdout by default)."""
+        print(self.report(**options), file=file or sys.stdout)
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+
+
+profiler = QueryProfiler()
+
+
+def explain(connection, query):
+    """
+    Returns the EXPLAIN QUERY PLAN steps for `query` as strings, binding
+    NULL to each '?' placeholder. Returns None when the plan cannot be built.
+    """
+    placeholders = _STRING_LITERAL.sub('', query).count('?')
+    try:
+        rows = connection.execute(f"EXPLAIN QUERY PLAN {query}",
+                                  (None,) * placeholders).fetchall()
+    except sqlite3.Error:
+        return None
+    return [row[-1] for row in rows]
+
+
+class _QueryListener(QueueListener):
+    """
+    Turns the plain tuples queued by log_queries into log records on the
+    listener thread and hands them to the 'queries' logger, so building
+    and formatting records never happens on the caller's thread.
+    Profiled entries also update the profiler here.
     """
-    Decorator that logs the SQL query before executing it.
+
+    def handle(self, entry):
+        if isinstance(entry, threading.Event):
+            entry.set()
+            return
+        (created, function, query, duration_ms, rows, error,
+         sampled, profile, plan) = entry
+        if profile is not None:
+            key = fingerprint(query) if query else function
+            profiler.record(key, query, duration_ms, rows, error)
+            explain_ms, database = profile
+            if query and duration_ms >= explain_ms and profiler.needs_plan(key):
+                if plan is None and database is not None:
+                    plan = profiler.explain(database, query)
+                profiler.set_plan(key, plan)
+        if sampled:
+            super().handle(entry)
+
+    def prepare(self, entry):
+        created, function, query, duration_ms, rows, error = entry[:6]
+        return logging.makeLogRecord({
+            'name': logger.name,
+            'levelno': logging.INFO,
+            'levelname': 'INFO',
+            'msg': 'query',
+            'created': created,
+            'function': function,
+            'query': query,
+            'fingerprint': fingerprint(query) if query else None,
+            'duration_ms': duration_ms,
+            'rows': rows,
+            'error': error,
+        })
+
+
+class _LoggerHandler(logging.Handler):
+    def emit(self, record):
+        logger.handle(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats query records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%d %H:%M:%S'),
+            'function': record.function,
+            'query': record.query,
+            'fingerprint': record.fingerprint,
+            'duration_ms': round(record.duration_ms, 3),
+            'rows': record.rows,
+        }
+        if record.error:
+            entry['error'] = record.error
+        return json.dumps(entry)
+
+
+def _start_listener():
+    """
+    Starts the background thread that drains queued query records into the
+    'queries' logger. Without other configuration, records are written to
+    stdout as JSON lines.
+    """
+    global _listener
+    if not logger.handlers:
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter())
+        logger.addHandler(output)
+        logger.setLevel(logging.INFO)
+    _listener = _QueryListener(_records, _LoggerHandler())
+    _listener.start()
+    atexit.register(_flush)
+
+
+def _flush():
+    """Waits until every queued record has been handled."""
+    if _listener is not None and _listener._thread is not None:
+        done = threading.Event()
+        _records.put(done)
+        done.wait()
+
+
+def _dump_at_exit():
+    if profiler.stats:
+        profiler.dump()
+
+
+def _enable_report_at_exit():
+    global _report_at_exit
+    if not _report_at_exit:
+        _report_at_exit = True
+        atexit.register(_dump_at_exit)
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(query):
+    """
+    Normalises a query for aggregation: literals become '?', IN lists
+    collapse to a single '?', and whitespace and case are normalised.
+    """
+    normalised = _STRING_LITERAL.sub('?', query)
+    normalised = _NUMBER_LITERAL.sub('?', normalised)
+    normalised = _IN_LIST.sub('(?)', normalised)
+    return _WHITESPACE.sub(' ', normalised).strip().lower()
+
+
+def _find_query(args, kwargs):
+    """Returns the query from kwargs or the first argument that looks like SQL."""
+    query = kwargs.get('query')
+    if query is None:
+        for arg in args:
+            if isinstance(arg, str) and _SQL_START.match(arg):
+                return arg
+    return query
+
+
+def _row_count(result):
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    rowcount = getattr(result, 'rowcount', None)
+    return rowcount if rowcount is not None and rowcount >= 0 else None
+
+
+def log_queries(func=None, *, sample_rate=1, slow_ms=None, profile=False,
+                explain_ms=100.0, database=None, report_at_exit=False):
+    """
+    Decorator that logs the SQL query a function executes as a structured
+    record with its duration, row count and normalised fingerprint.
+    The call only queues a tuple; a background thread builds and writes
+    the record, off the hot path.
+    Can be used bare (@log_queries) or with options.
     
     Args:
         func: The function to be decorated
+        sample_rate: Log one call in every `sample_rate`
+        slow_ms: When set, log only calls taking at least this many
+            milliseconds (sample_rate is then ignored)
+        profile: Feed every call (not just sampled ones) to `profiler`
+        explain_ms: Capture EXPLAIN QUERY PLAN for profiled queries at least
+            this slow, using the sqlite3 connection passed as the first
+            argument or, failing that, a connection to `database`
+        database: SQLite file to explain plans against when the function
+            opens its own connection
+        report_at_exit: Print the profiler report when the process exits
         
     Returns:
         The wrapper function
     """
+    if func is None:
+        return lambda f: log_queries(
+            f, sample_rate=sample_rate, slow_ms=slow_ms, profile=profile,
+            explain_ms=explain_ms, database=database,
+            report_at_exit=report_at_exit)
+    if _listener is None:
+        _start_listener()
+    if report_at_exit:
+        _enable_report_at_exit()
+    counter = itertools.count()
+    profile_options = (explain_ms, database) if profile else None
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Extract the query from args or kwargs
-        query = kwargs.get('query')
-        if query is None and args:
-            # Try to find a string argument that looks like a query
-            for arg in args:
-                if isinstance(arg, str) and ('SELECT' in arg.upper() or 
-                                            'INSERT' in arg.upper() or 
-                                            'UPDATE' in arg.upper() or 
-                                            'DELETE' in arg.upper()):
-                    query = arg
-                    break
-        
-        # Add timestamp to the log
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        if query:
-            print(f"[{timestamp}] Executing query: {query}")
-        else:
-            print(f"[{timestamp}] Executing a query (could not determine the query string)")
-            
-        return func(*args, **kwargs)
+        start = time.perf_counter()
+        error = None
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if slow_ms is not None:
+                sampled = duration_ms >= slow_ms
+            else:
+                sampled = next(counter) % sample_rate == 0
+            if sampled or profile:
+                # Only a tuple is queued here; the listener thread builds
+                # the record, fingerprints the query and writes it out
+                query = _find_query(args, kwargs)
+                plan = None
+                if (profile and query and duration_ms >= explain_ms
+                        and args and isinstance(args[0], sqlite3.Connection)
+                        and profiler.needs_plan(fingerprint(query))):
+                    # Rare slow path: explain on the caller's own connection
+                    plan = explain(args[0], query)
+                _records.put((time.time(), func.__qualname__, query,
+                              duration_ms, _row_count(result), error,
+                              sampled, profile_options, plan))
     
     return wrapper
 
+
+def measure_overhead(calls=100_000):
+    """Prints the per-call overhead log_queries adds to a trivial function."""
+    global _records
+    def plain(query):
+        return [query]
+
+    logged = log_queries(plain)
+    sampled = log_queries(sample_rate=1000)(plain)
+    slow_only = log_queries(slow_ms=1000)(plain)
+    # Queue the benchmark's records somewhere nobody reads them
+    records, _records = _records, queue.SimpleQueue()
+    try:
+        timings = {}
+        for name, call in (('plain', plain), ('logged', logged),
+                           ('1 in 1000', sampled), ('slow only', slow_only)):
+            start = time.perf_counter()
+            for _ in range(calls):
+                call("SELECT * FROM users WHERE id = 1")
+            timings[name] = (time.perf_counter() - start) / calls * 1e6
+    finally:
+        _records = records
+    for name, micros in timings.items():
+        overhead = micros - timings['plain']
+        print(f"{name:>10}: {micros:.2f} us/call ({overhead:+.2f} us overhead)")
+
 @log_queries
 def fetch_all_users(query):
     conn = sqlite3.connect('users.db')
@@ -48,4 +413,7 @@ def fetch_all_users(query):
     return results
 
 # fetch users while logging the query
-users = fetch_all_users(query="SELECT * FROM users")
\ No newline at end of file
+users = fetch_all_users(query="SELECT * FROM users")
+
+if __name__ == "__main__" and sys.argv[1:] == ['overhead']:
+    measure_overhead()
@@ -1,21 +1,29 @@
 import sqlite3
 import functools
+import inspect
+from connection_pool import POOL_TIMEOUT, get_pool
 
 def with_db_connection(func):
     """
-    Decorator that opens a database connection, passes it to the function,
-    and ensures the connection is closed afterward.
+    Decorator that borrows a database connection from the pool, passes it to
+    the function, and ensures the connection is returned afterward.
+    Coroutine functions get an aiosqlite connection instead.
     """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Imported here so synchronous callers don't need aiosqlite
+            import aiosqlite
+            async with aiosqlite.connect('database.db') as connection:
+                return await func(connection, *args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Open database connection
-        connection = sqlite3.connect('database.db')  # You can change the database name
-        try:
+        # Borrow a pooled connection instead of opening one per call
+        with get_pool('database.db').connection(POOL_TIMEOUT) as connection:  # You can change the database name
             # Call the original function with connection as first argument
             return func(connection, *args, **kwargs)
-        finally:
-            # Ensure connection is closed even if an exception occurs
-            connection.close()
     return wrapper
 
 @with_db_connection
@@ -1,45 +1,282 @@
 import sqlite3 
+import atexit
 import functools
+import inspect
+import threading
+import time
 from typing import Callable, Any
+from connection_pool import POOL_TIMEOUT, get_pool
+from query_cache import WRITE_ACTIONS, async_track_tables, default_cache, track_tables
 
 def with_db_connection(func: Callable) -> Callable:
     """
     Decorator that provides a database connection to the wrapped function.
-    Automatically opens and closes the connection.
+    Automatically borrows the connection from the pool and returns it.
+    Coroutine functions get an aiosqlite connection instead.
     """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Imported here so synchronous callers don't need aiosqlite
+            import aiosqlite
+            async with aiosqlite.connect('example.db') as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Create connection to database
-        conn = sqlite3.connect('example.db')
-        
-        try:
+        # Borrow a pooled connection; it is returned regardless of success or failure
+        with get_pool('example.db').connection(POOL_TIMEOUT) as conn:
             # Call the original function with connection as first argument
             return func(conn, *args, **kwargs)
-        finally:
-            # Ensure connection is closed regardless of success or failure
-            conn.close()
     
     return wrapper
 
-def transactional(func: Callable) -> Callable:
+# Savepoint depth of connections currently inside a transactional call,
+# keyed by id() since sqlite3 connections cannot be weakly referenced
+_depths = {}
+
+def _in_savepoint(conn, depth, func, args, kwargs):
+    """Runs a nested transactional call inside its own savepoint."""
+    name = f"transactional_{depth}"
+    conn.execute(f"SAVEPOINT {name}")
+    _depths[id(conn)] = depth + 1
+    try:
+        result = func(conn, *args, **kwargs)
+    except Exception:
+        # Undo only this call's writes; the outer transaction carries on
+        conn.execute(f"ROLLBACK TO {name}")
+        conn.execute(f"RELEASE {name}")
+        raise
+    finally:
+        _depths[id(conn)] = depth
+    conn.execute(f"RELEASE {name}")
+    return result
+
+async def _in_savepoint_async(conn, depth, func, args, kwargs):
+    """Coroutine version of _in_savepoint for aiosqlite connections."""
+    name = f"transactional_{depth}"
+    await conn.execute(f"SAVEPOINT {name}")
+    _depths[id(conn)] = depth + 1
+    try:
+        result = await func(conn, *args, **kwargs)
+    except Exception:
+        await conn.execute(f"ROLLBACK TO {name}")
+        await conn.execute(f"RELEASE {name}")
+        raise
+    finally:
+        _depths[id(conn)] = depth
+    await conn.execute(f"RELEASE {name}")
+    return result
+
+class GroupCommit:
+    """
+    Batches the writes of many small transactional calls into one commit,
+    so they share a single fsync instead of paying for one each.
+
+    Calls run one at a time on the committer's own writer connection, each
+    inside a savepoint so a failing call only undoes its own writes. The
+    open transaction is committed once `max_batch` calls are pending or
+    the oldest pending call is `max_delay` seconds old, whichever comes
+    first. A call's writes are durable only after that commit; pass
+    wait=True to transactional to block until then.
+    """
+
+    def __init__(self, database, max_batch=100, max_delay=0.05):
+        self.connection = sqlite3.connect(database, check_same_thread=False)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.commits = 0
+        self.last_error = None
+        self._pending = 0
+        self._first_pending = None
+        self._written = set()
+        self._generation = 0
+        # Commit error (or None) of batches that callers are still waiting
+        # on, and how many are waiting: generation -> error / count
+        self._outcomes = {}
+        self._waiting = {}
+        self._closed = False
+        self._condition = threading.Condition()
+        self._timer = threading.Thread(target=self._run_timer, daemon=True)
+        self._timer.start()
+        atexit.register(self.close)
+
+    def run(self, func, args, kwargs, wait=False):
+        """Applies one call's writes and commits when the batch is due."""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Group commit is closed")
+            conn = self.connection
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            # Mark the writer as inside a transaction only for this call, so
+            # transactional calls nested in func use savepoints, and a later
+            # connection reusing the writer's id() is not seen as nested
+            _depths[id(conn)] = 1
+            try:
+                with track_tables(conn, WRITE_ACTIONS) as written:
+                    result = _in_savepoint(conn, 1, func, args, kwargs)
+            finally:
+                del _depths[id(conn)]
+            self._written |= written
+            self._pending += 1
+            if self._first_pending is None:
+                self._first_pending = time.monotonic()
+                self._condition.notify_all()
+            generation = self._generation
+            if wait:
+                self._waiting[generation] = self._waiting.get(generation, 0) + 1
+            if self._pending >= self.max_batch:
+                self._commit()
+            if wait:
+                try:
+                    while self._generation == generation:
+                        self._condition.wait()
+                    # Only this batch's outcome counts: a later commit may
+                    # already have succeeded and reset last_error
+                    error = self._outcomes.get(generation)
+                finally:
+                    self._waiting[generation] -= 1
+                    if not self._waiting[generation]:
+                        del self._waiting[generation]
+                        self._outcomes.pop(generation, None)
+                if error is not None:
+                    raise error
+        return result
+
+    def _commit(self):
+        """Commits the pending batch. Must be called with the lock held."""
+        try:
+            self.connection.commit()
+            default_cache.invalidate_tables(self._written)
+            self.commits += 1
+            self.last_error = None
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            self.last_error = e
+        if self._generation in self._waiting:
+            self._outcomes[self._generation] = self.last_error
+        self._pending = 0
+        self._first_pending = None
+        self._written = set()
+        self._generation += 1
+        self._condition.notify_all()
+
+    def _run_timer(self):
+        with self._condition:
+            while not self._closed:
+                if self._first_pending is None:
+                    self._condition.wait()
+                    continue
+                remaining = self._first_pending + self.max_delay - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                self._commit()
+
+    def flush(self):
+        """Commits pending writes now."""
+        with self._condition:
+            if self._pending:
+                self._commit()
+
+    def close(self):
+        """Commits pending writes and closes the writer connection."""
+        with self._condition:
+            if self._closed:
+                return
+            if self._pending:
+                self._commit()
+            self._closed = True
+            self._condition.notify_all()
+        self.connection.close()
+
+def transactional(func: Callable = None, *, group_commit: GroupCommit = None,
+                  wait: bool = False) -> Callable:
     """
     Decorator that wraps a function in a database transaction.
     Commits if the function completes successfully or rolls back if an exception occurs.
+    After a commit or a rollback, cached query results that read the written tables
+    are invalidated.
+    Works the same way on coroutine functions receiving an aiosqlite connection.
+
+    Nested transactional calls on the same connection run in savepoints, so
+    only the outermost call commits; a failing nested call undoes just its
+    own writes.
+
+    With group_commit, calls run on the GroupCommit's writer connection (the
+    connection passed in is not used) and share batched commits; `wait`
+    blocks each call until its batch is committed.
     """
+    if func is None:
+        return lambda f: transactional(f, group_commit=group_commit, wait=wait)
+
+    if group_commit is not None:
+        if inspect.iscoroutinefunction(func):
+            raise TypeError("group_commit only supports synchronous functions")
+
+        @functools.wraps(func)
+        def group_wrapper(conn, *args, **kwargs):
+            return group_commit.run(func, args, kwargs, wait)
+        return group_wrapper
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            depth = _depths.get(id(conn), 0)
+            if depth:
+                return await _in_savepoint_async(conn, depth, func, args, kwargs)
+            _depths[id(conn)] = 1
+            written = set()
+            try:
+                if not conn.in_transaction:
+                    await conn.execute("BEGIN")
+                async with async_track_tables(conn, WRITE_ACTIONS) as written:
+                    result = await func(conn, *args, **kwargs)
+                await conn.commit()
+                default_cache.invalidate_tables(written)
+                return result
+            except Exception as e:
+                await conn.rollback()
+                default_cache.invalidate_tables(written)
+                raise e
+            finally:
+                del _depths[id(conn)]
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        depth = _depths.get(id(conn), 0)
+        if depth:
+            # Already inside a transaction on this connection
+            return _in_savepoint(conn, depth, func, args, kwargs)
+        _depths[id(conn)] = 1
+        written = set()
         try:
-            # Execute the function
-            result = func(conn, *args, **kwargs)
+            # Start the transaction explicitly so a nested call's savepoint
+            # can never become the outermost one and commit on release
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+
+            # Execute the function, recording the tables it writes to
+            with track_tables(conn, WRITE_ACTIONS) as written:
+                result = func(conn, *args, **kwargs)
             
             # If successful, commit the transaction
             conn.commit()
+            default_cache.invalidate_tables(written)
             
             return result
         except Exception as e:
             # If an error occurs, roll back the transaction
             conn.rollback()
+            # Drop anything cached from the tables it wrote, in case a result
+            # reflecting the rolled-back writes was stored
+            default_cache.invalidate_tables(written)
             raise e  # Re-raise the exception after rollback
+        finally:
+            del _depths[id(conn)]
     
     return wrapper
 
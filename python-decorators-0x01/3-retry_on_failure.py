@@ -1,40 +1,90 @@
 import time
+import asyncio
 import sqlite3 
 import functools
+import inspect
+from connection_pool import POOL_TIMEOUT, get_pool
+from retry_policy import backoff_delay, default_budget, is_retryable, should_retry
 
 def with_db_connection(func):
     """Decorator to handle database connection setup and teardown."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Imported here so synchronous callers don't need aiosqlite
+            import aiosqlite
+            async with aiosqlite.connect('example.db') as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('example.db')
-        try:
+        with get_pool('example.db').connection(POOL_TIMEOUT) as conn:
             result = func(conn, *args, **kwargs)
             return result
-        finally:
-            conn.close()
     return wrapper
 
-def retry_on_failure(retries=3, delay=2):
+def retry_on_failure(retries=3, delay=2, max_delay=30, deadline=None,
+                     retry_on=is_retryable, budget=default_budget, jitter=True):
     """
-    Decorator that retries a function if it raises an exception.
+    Decorator that retries a function if it raises a retryable exception.
+    Waits grow exponentially from `delay` with full jitter, so workers that
+    failed together spread their retries out instead of stampeding.
+    Coroutine functions wait with asyncio.sleep so the event loop keeps running.
     
     Args:
         retries (int): Maximum number of retry attempts
-        delay (int): Delay in seconds between retries
+        delay (float): Base delay in seconds before the first retry
+        max_delay (float): Upper bound for a single delay
+        deadline (float): Overall seconds after which no retry is started
+        retry_on: Predicate or exception class(es) deciding what is retried
+            (defaults to transient errors such as "database is locked")
+        budget (RetryBudget): Shared token bucket capping retries process-wide;
+            None disables it
+        jitter (bool): Randomise each delay between 0 and its backoff value
     """
+    def next_delay(error, attempts, started):
+        """Returns how long to wait before retrying, or None to give up."""
+        if attempts > retries or not should_retry(retry_on, error):
+            return None
+        wait = backoff_delay(attempts, delay, max_delay, jitter)
+        if deadline is not None and time.monotonic() - started + wait > deadline:
+            return None
+        if budget is not None and not budget.acquire():
+            return None
+        print(f"Operation failed. Retrying in {wait:.2f} seconds... ({attempts}/{retries})")
+        return wait
+
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.monotonic()
+                attempts = 0
+                while True:
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        attempts += 1
+                        wait = next_delay(e, attempts, started)
+                        if wait is None:
+                            raise e
+                        await asyncio.sleep(wait)
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            started = time.monotonic()
             attempts = 0
-            while attempts <= retries:
+            while True:
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
                     attempts += 1
-                    if attempts > retries:
+                    wait = next_delay(e, attempts, started)
+                    if wait is None:
                         raise e
-                    print(f"Operation failed. Retrying in {delay} seconds... ({attempts}/{retries})")
-                    time.sleep(delay)
+                    time.sleep(wait)
         return wrapper
     return decorator
 
@@ -1,33 +1,154 @@
 import time
 import sqlite3 
 import functools
+import inspect
+from connection_pool import POOL_TIMEOUT, get_pool
+from query_cache import READ_ACTIONS, async_track_tables, default_cache, track_tables
 
-query_cache = {}
+# Bounded LRU/TTL cache shared with transactional, which invalidates it on writes
+query_cache = default_cache
+_MISSING = object()
 
 def with_db_connection(func):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(query, *args, **kwargs):
+            # Imported here so synchronous callers don't need aiosqlite
+            import aiosqlite
+            async with aiosqlite.connect('database.db') as conn:
+                return await func(conn, query, *args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
-    def wrapper(query, **kwargs):
-        conn = sqlite3.connect('database.db')
-        try:
-            result = func(conn, query, **kwargs)
+    def wrapper(query, *args, **kwargs):
+        with get_pool('database.db').connection(POOL_TIMEOUT) as conn:
+            result = func(conn, query, *args, **kwargs)
             return result
-        finally:
-            conn.close()
     return wrapper
 
-def cache_query(func):
+def _cache_key(database, query, args, kwargs):
+    """
+    Builds a key from the database file, the query and its parameters, so
+    the same SQL on two databases is cached separately. Returns None when
+    the key is unhashable or the database has no file (in-memory databases
+    are private to their connection, so their results are not shared).
+    """
+    if not database:
+        return None
+    key = (database, query, args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+def _database_path(conn):
+    """Returns the file backing the connection's main database."""
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == 'main':
+            return path
+
+async def _async_database_path(conn):
+    """Async version of _database_path for aiosqlite connections."""
+    async with conn.execute("PRAGMA database_list") as cursor:
+        for _, name, path in await cursor.fetchall():
+            if name == 'main':
+                return path
+
+def _async_cache_query(func, store, ttl, stale_ttl):
+    """Builds the cache_query wrapper for coroutine functions."""
+    @functools.wraps(func)
+    async def async_wrapper(conn, query, *args, **kwargs):
+        if conn.in_transaction:
+            # See the note in the synchronous wrapper
+            return await func(conn, query, *args, **kwargs)
+        database = await _async_database_path(conn)
+        key = _cache_key(database, query, args, kwargs)
+        if key is None:
+            return await func(conn, query, *args, **kwargs)
+        loaded = []
+
+        async def load(connection=conn):
+            async with async_track_tables(connection, READ_ACTIONS) as tables:
+                result = await func(connection, query, *args, **kwargs)
+            loaded.append(True)
+            print(f"Caching result for query: {query}")
+            return result, tables
+
+        refresh = None
+        if stale_ttl and ttl != 0:
+            # The caller's connection closes when it returns, so a background
+            # refresh opens its own
+            async def refresh():
+                import aiosqlite
+                async with aiosqlite.connect(database) as connection:
+                    return await load(connection)
+
+        result = await store.get_or_load_async(key, load, ttl, stale_ttl, refresh)
+        if not loaded:
+            print(f"Using cached result for query: {query}")
+        return result
+    async_wrapper.cache = store
+    return async_wrapper
+
+def cache_query(func=None, *, ttl=None, stale_ttl=0.0, cache=None):
+    """
+    Decorator that caches query results keyed by the database, the query and
+    its parameters.
+    Can be used bare (@cache_query) or with options (@cache_query(ttl=60)).
+    Concurrent misses for the same query run it only once; the other callers
+    wait for that result. Coroutine functions are cached the same way
+    using an asyncio-aware single-flight. Queries run inside an open
+    transaction bypass the cache.
+
+    Args:
+        ttl: Seconds a result stays valid (defaults to the cache's ttl)
+        stale_ttl: Seconds an expired result may still be served while a
+            background refresh runs on a pooled connection
+        cache: QueryCache to store results in (defaults to query_cache)
+    """
+    if func is None:
+        return lambda f: cache_query(f, ttl=ttl, stale_ttl=stale_ttl, cache=cache)
+    store = query_cache if cache is None else cache
+    if inspect.iscoroutinefunction(func):
+        return _async_cache_query(func, store, ttl, stale_ttl)
+
     @functools.wraps(func)
-    def wrapper(conn, query, **kwargs):
-        # Use the query string as the cache key
-        if query in query_cache:
+    def wrapper(conn, query, *args, **kwargs):
+        if conn.in_transaction:
+            # Inside a transaction the query may see uncommitted writes that
+            # could still be rolled back, and a cached result would hide the
+            # transaction's own writes from it, so bypass the cache
+            return func(conn, query, *args, **kwargs)
+        # Use the database, the query string and its parameters as the cache key
+        database = _database_path(conn)
+        key = _cache_key(database, query, args, kwargs)
+        if key is None:
+            return func(conn, query, *args, **kwargs)
+        loaded = []
+
+        def load(connection=conn):
+            # Execute the function, remembering which tables it read so writes
+            # to those tables can invalidate the cached result
+            with track_tables(connection, READ_ACTIONS) as tables:
+                result = func(connection, query, *args, **kwargs)
+            loaded.append(True)
+            print(f"Caching result for query: {query}")
+            return result, tables
+
+        refresh = None
+        if stale_ttl and ttl != 0:
+            # The caller's connection goes back to the pool when it returns,
+            # so a background refresh borrows its own
+            def refresh():
+                with get_pool(database).connection(POOL_TIMEOUT) as connection:
+                    return load(connection)
+
+        result = store.get_or_load(key, load, ttl, stale_ttl, refresh)
+        if not loaded:
             print(f"Using cached result for query: {query}")
-            return query_cache[query]
-        
-        # Execute the function and cache the result
-        result = func(conn, query, **kwargs)
-        query_cache[query] = result
-        print(f"Caching result for query: {query}")
         return result
+    wrapper.cache = store
     return wrapper
 
 @with_db_connection
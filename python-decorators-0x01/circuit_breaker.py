@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Circuit breaker decorator used alongside retry_on_failure
+
+    @circuit_breaker(failure_rate=0.5, reset_timeout=15)
+    @with_db_connection
+    def fetch_users(conn):
+        ...
+
+Placed outside with_db_connection, an open circuit rejects calls before a
+connection is even borrowed.
+"""
+import functools
+import inspect
+import threading
+import time
+from collections import deque
+
+from retry_policy import is_retryable
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the function while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of recent calls and stops calling a failing database.
+
+    - closed: calls go through; once at least `minimum_calls` calls in the
+      last `window` seconds have a failure rate of `failure_rate` or more,
+      the circuit opens
+    - open: calls fail fast with CircuitOpenError for `reset_timeout` seconds
+    - half_open: up to `probe_calls` calls are let through as probes; if they
+      all succeed the circuit closes, and any failure opens it again
+
+    Only exceptions accepted by `failure_on` count as failures (by default
+    the transient errors retry_on_failure retries); other exceptions are
+    re-raised but count as the database having answered. A call that is
+    cancelled or interrupted counts as neither and frees its probe slot.
+
+    Each state change starts a new generation. Outcomes of calls admitted
+    in an earlier generation are ignored, so a slow call admitted while
+    closed cannot close the circuit again as if it were a probe.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name='database', failure_rate=0.5, minimum_calls=10,
+                 window=30.0, reset_timeout=15.0, probe_calls=1,
+                 failure_on=is_retryable, on_state_change=None,
+                 clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.minimum_calls = minimum_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.probe_calls = probe_calls
+        self.failure_on = failure_on
+        self.on_state_change = on_state_change
+        self.clock = clock
+        self.state = self.CLOSED
+        self.rejected = 0
+        self.transitions = deque(maxlen=100)  # (time, from_state, to_state)
+        self._calls = deque()  # (time, failed) within the window
+        self._opened_at = None
+        self._probes = 0
+        self._probe_successes = 0
+        self._generation = 0
+        self._changes = []  # (from_state, to_state) not yet reported
+        self._lock = threading.Lock()
+
+    def _transition(self, state):
+        """Moves to a new state. Must be called with the lock held."""
+        previous, self.state = self.state, state
+        self._generation += 1
+        self.transitions.append((time.time(), previous, state))
+        if state == self.OPEN:
+            self._opened_at = self.clock()
+        elif state == self.HALF_OPEN:
+            self._probes = 0
+            self._probe_successes = 0
+        else:
+            self._calls.clear()
+        self._changes.append((previous, state))
+
+    def _notify(self):
+        """
+        Reports queued state changes to on_state_change. Called after the
+        lock is released, so the callback may use the breaker (e.g. stats).
+        """
+        with self._lock:
+            changes, self._changes = self._changes, []
+        if self.on_state_change is not None:
+            for previous, state in changes:
+                self.on_state_change(self, previous, state)
+
+    def _trim(self, now):
+        while self._calls and now - self._calls[0][0] > self.window:
+            self._calls.popleft()
+
+    def before_call(self):
+        """
+        Admits a call or raises CircuitOpenError. Returns a ticket to pass
+        to record() or release() once the call finishes.
+        """
+        try:
+            with self._lock:
+                if self.state == self.OPEN:
+                    if self.clock() - self._opened_at < self.reset_timeout:
+                        self.rejected += 1
+                        raise CircuitOpenError(f"Circuit '{self.name}' is open")
+                    self._transition(self.HALF_OPEN)
+                if self.state == self.HALF_OPEN:
+                    if self._probes >= self.probe_calls:
+                        self.rejected += 1
+                        raise CircuitOpenError(
+                            f"Circuit '{self.name}' is half-open; probe in progress")
+                    self._probes += 1
+                return self._generation
+        finally:
+            self._notify()
+
+    def record(self, error=None, ticket=None):
+        """
+        Records the outcome of an admitted call. Outcomes whose ticket is
+        from an earlier generation are ignored.
+        """
+        failed = error is not None and self.failure_on(error)
+        try:
+            with self._lock:
+                if ticket is not None and ticket != self._generation:
+                    return
+                if self.state == self.HALF_OPEN:
+                    if failed:
+                        self._transition(self.OPEN)
+                    else:
+                        self._probe_successes += 1
+                        if self._probe_successes >= self.probe_calls:
+                            self._transition(self.CLOSED)
+                    return
+                if self.state != self.CLOSED:
+                    return
+                now = self.clock()
+                self._calls.append((now, failed))
+                self._trim(now)
+                if failed and len(self._calls) >= self.minimum_calls:
+                    failures = sum(1 for _, f in self._calls if f)
+                    if failures / len(self._calls) >= self.failure_rate:
+                        self._transition(self.OPEN)
+        finally:
+            self._notify()
+
+    def release(self, ticket):
+        """
+        Ends an admitted call without an outcome (it was cancelled or
+        interrupted), giving back its probe slot if it was a probe.
+        """
+        with self._lock:
+            if ticket == self._generation and self.state == self.HALF_OPEN:
+                self._probes -= 1
+
+    @property
+    def stats(self):
+        with self._lock:
+            self._trim(self.clock())
+            calls = len(self._calls)
+            failures = sum(1 for _, f in self._calls if f)
+            return {
+                'name': self.name,
+                'state': self.state,
+                'calls': calls,
+                'failure_rate': failures / calls if calls else 0.0,
+                'rejected': self.rejected,
+                'transitions': list(self.transitions),
+            }
+
+    def __call__(self, func):
+        """Decorates a function (or coroutine function) with this breaker."""
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                ticket = self.before_call()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    self.record(e, ticket)
+                    raise
+                except BaseException:
+                    # Cancelled (e.g. by a timeout): no verdict on the database
+                    self.release(ticket)
+                    raise
+                self.record(ticket=ticket)
+                return result
+            async_wrapper.breaker = self
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            ticket = self.before_call()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self.record(e, ticket)
+                raise
+            except BaseException:
+                self.release(ticket)
+                raise
+            self.record(ticket=ticket)
+            return result
+        wrapper.breaker = self
+        return wrapper
+
+
+def circuit_breaker(**options):
+    """
+    Decorator factory that gives the decorated function its own
+    CircuitBreaker. To share one breaker between several functions,
+    create a CircuitBreaker and use the instance itself as the decorator.
+    """
+    return CircuitBreaker(**options)
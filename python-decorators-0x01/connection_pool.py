@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Thread-safe SQLite connection pool shared by the with_db_connection decorators
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Seconds the with_db_connection decorators wait for a free connection, so an
+# exhausted pool (e.g. nested decorated calls in every thread) raises
+# PoolTimeout instead of hanging
+POOL_TIMEOUT = 30.0
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available in time."""
+
+
+class ConnectionPool:
+    """
+    A bounded pool of SQLite connections.
+
+    - Keeps at least `min_size` connections open and never more than `max_size`
+    - Runs a cheap health check on connections idle for longer than
+      `health_check_interval` seconds before handing them out
+    - Closes connections that stay idle for more than `max_idle` seconds
+    - With `thread_affinity`, hands each thread the connection it used last
+      when that one is idle, so a thread keeps reusing a warm connection
+    """
+
+    def __init__(self, database, min_size=1, max_size=5, max_idle=300.0,
+                 health_check_interval=30.0, thread_affinity=True):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size")
+        self.database = database
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.thread_affinity = thread_affinity
+        self._idle = []  # (connection, released_at), most recent last
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        with self._condition:
+            for _ in range(min_size):
+                self._idle.append((self._connect(), time.monotonic()))
+                self._size += 1
+
+    def _connect(self):
+        # Connections move between threads, so the same-thread check is off;
+        # the pool guarantees only one thread uses a connection at a time.
+        return sqlite3.connect(self.database, check_same_thread=False)
+
+    def _healthy(self, connection):
+        try:
+            connection.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _evict_idle(self, now):
+        """Closes connections idle past max_idle, keeping min_size open."""
+        kept = []
+        for connection, released_at in self._idle:
+            if now - released_at > self.max_idle and self._size > self.min_size:
+                connection.close()
+                self._size -= 1
+            else:
+                kept.append((connection, released_at))
+        self._idle = kept
+
+    def _take_idle(self):
+        """Pops the calling thread's last connection if idle, else the most recent."""
+        preferred = getattr(self._local, 'connection', None)
+        if self.thread_affinity and preferred is not None:
+            for index, (connection, released_at) in enumerate(self._idle):
+                if connection is preferred:
+                    return self._idle.pop(index)
+        return self._idle.pop()
+
+    def acquire(self, timeout=None):
+        """
+        Borrows a connection, waiting up to `timeout` seconds (forever if None)
+        when all max_size connections are in use.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                now = time.monotonic()
+                self._evict_idle(now)
+                if self._idle:
+                    connection, released_at = self._take_idle()
+                    if (now - released_at > self.health_check_interval
+                            and not self._healthy(connection)):
+                        connection.close()
+                        try:
+                            connection = self._connect()
+                        except BaseException:
+                            # The closed connection no longer counts
+                            # towards max_size
+                            self._size -= 1
+                            self._condition.notify()
+                            raise
+                    break
+                if self._size < self.max_size:
+                    connection = self._connect()
+                    self._size += 1
+                    break
+                remaining = None if deadline is None else deadline - now
+                if remaining is not None and remaining <= 0:
+                    raise PoolTimeout(
+                        f"No connection available within {timeout} seconds")
+                self._condition.wait(remaining)
+        self._local.connection = connection
+        return connection
+
+    def release(self, connection):
+        """
+        Returns a connection to the pool. Any transaction the caller left
+        open is rolled back, as closing the connection would have done.
+        """
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+            broken = False
+        except sqlite3.Error:
+            broken = True
+        with self._condition:
+            if broken or self._closed:
+                connection.close()
+                self._size -= 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that borrows a connection and always returns it."""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self):
+        """Closes idle connections; busy ones are closed when released."""
+        with self._condition:
+            self._closed = True
+            for connection, _ in self._idle:
+                connection.close()
+                self._size -= 1
+            self._idle = []
+            self._condition.notify_all()
+
+    @property
+    def stats(self):
+        with self._condition:
+            return {'size': self._size, 'idle': len(self._idle)}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database, **options):
+    """Returns the process-wide pool for `database`, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            pool = _pools[database] = ConnectionPool(database, **options)
+        return pool
+
+
+def benchmark(calls=20_000):
+    """Compares calls/sec of a short query with and without the pool."""
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'bench.db')
+        with sqlite3.connect(database) as conn:
+            conn.execute(
+                "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+                "email TEXT, age INTEGER)")
+            conn.executemany(
+                "INSERT INTO users VALUES (?, ?, ?, ?)",
+                ((i, f"user{i}", f"user{i}@example.com", 20 + i % 50)
+                 for i in range(1, 1001)))
+        conn.close()
+
+        def unpooled(user_id):
+            conn = sqlite3.connect(database)
+            try:
+                return conn.execute(
+                    "SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+            finally:
+                conn.close()
+
+        pool = ConnectionPool(database)
+
+        def pooled(user_id):
+            with pool.connection() as conn:
+                return conn.execute(
+                    "SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+
+        for name, call in (('connect per call', unpooled), ('pooled', pooled)):
+            start = time.perf_counter()
+            for i in range(calls):
+                call(i % 1000 + 1)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>16}: {calls / elapsed:,.0f} calls/sec")
+        pool.close()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Bounded query-result cache shared by cache_query and transactional
+"""
+import asyncio
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+READ_ACTIONS = (sqlite3.SQLITE_READ,)
+WRITE_ACTIONS = (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE,
+                 sqlite3.SQLITE_DELETE)
+
+
+# Active trackers per connection, keyed by id() since sqlite3 connections
+# cannot be weakly referenced: id(conn) -> [(tables, actions), ...]
+_trackers = {}
+
+
+def _push_tracker(conn, actions):
+    """Registers a tracker and returns its table set and the authorizer to install."""
+    tables = set()
+    trackers = _trackers.setdefault(id(conn), [])
+    trackers.append((tables, actions))
+    return tables, _authorizer(trackers)
+
+
+def _pop_tracker(conn, tables):
+    """Unregisters a tracker; returns the authorizer to reinstall, or None."""
+    trackers = _trackers[id(conn)]
+    for index, (tracked, _) in enumerate(trackers):
+        if tracked is tables:
+            del trackers[index]
+            break
+    if trackers:
+        return _authorizer(trackers)
+    del _trackers[id(conn)]
+    return None
+
+
+@contextmanager
+def track_tables(conn, actions):
+    """
+    Context manager that collects the names of the tables touched by
+    statements the connection prepares while it is active, using SQLite's
+    authorizer hook. `actions` selects reads, writes, or both.
+
+    Trackers nest: while a read tracker runs inside a transactional write
+    tracker on the same connection, statements are reported to both, and
+    the outer tracker keeps recording once the inner one exits.
+    """
+    tables, authorizer = _push_tracker(conn, actions)
+    # Setting the authorizer also expires the connection's cached
+    # statements, so reused SQL is authorized again for this tracker
+    conn.set_authorizer(authorizer)
+    try:
+        yield tables
+    finally:
+        conn.set_authorizer(_pop_tracker(conn, tables))
+
+
+@asynccontextmanager
+async def async_track_tables(conn, actions):
+    """Async version of track_tables for aiosqlite connections."""
+    tables, authorizer = _push_tracker(conn, actions)
+    await conn.set_authorizer(authorizer)
+    try:
+        yield tables
+    finally:
+        await conn.set_authorizer(_pop_tracker(conn, tables))
+
+
+def _authorizer(trackers):
+    """
+    Builds an authorizer callback that records table names into every
+    active tracker whose actions match.
+    """
+    trackers = list(trackers)
+
+    def authorizer(action, arg1, arg2, db_name, trigger):
+        if arg1 and not arg1.startswith('sqlite_'):
+            for tables, actions in trackers:
+                if action in actions:
+                    tables.add(arg1)
+        return sqlite3.SQLITE_OK
+    return authorizer
+
+
+def estimate_size(value):
+    """Roughly estimates the memory held by a query result, in bytes."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v)
+                    for k, v in value.items())
+    return size
+
+
+class CacheEntry:
+    __slots__ = ('value', 'expires_at', 'stale_until', 'tables', 'size')
+
+    def __init__(self, value, expires_at, stale_until, tables, size):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.tables = tables
+        self.size = size
+
+
+class _Flight:
+    """A load in progress that concurrent callers for the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def result(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+# Result of an async flight whose loading caller was cancelled
+_ABANDONED = object()
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query results.
+
+    - Holds at most `max_entries` results and `max_bytes` estimated bytes,
+      evicting the least recently used entries first
+    - Entries expire `ttl` seconds after they are stored (None never expires)
+    - Each entry remembers the tables it read, so invalidate_tables() drops
+      every result a write may have made stale
+    - get_or_load() coalesces concurrent misses for the same key into a
+      single load, and can serve expired entries while they are refreshed
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.coalesced = 0
+        self.stale_hits = 0
+        self._flights = {}
+        self._async_flights = {}
+        self._refreshes = set()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _lookup(self, key):
+        """
+        Returns (state, value) where state is 'fresh', 'stale' or None,
+        counting a hit or a miss. Must be called with the lock held.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at is not None:
+            now = time.monotonic()
+            if entry.stale_until <= now:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            elif entry.expires_at <= now:
+                self.misses += 1
+                return 'stale', entry.value
+        if entry is None:
+            self.misses += 1
+            return None, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return 'fresh', entry.value
+
+    def get(self, key, default=None):
+        """Returns the fresh cached value for `key`, counting a hit or a miss."""
+        with self._lock:
+            state, value = self._lookup(key)
+        return value if state == 'fresh' else default
+
+    def get_or_load(self, key, loader, ttl=None, stale_ttl=0.0,
+                    refresh=None):
+        """
+        Returns the cached value for `key`, calling loader() on a miss.
+        Both loader and refresh return a (value, tables) pair.
+
+        Concurrent misses for the same key are coalesced: one caller runs
+        the loader and the others wait for its result (single-flight).
+        An entry expired for less than `stale_ttl` seconds is returned
+        as-is while `refresh` reloads it on a background thread, at most one
+        refresh per key at a time (stale-while-revalidate). `refresh` must
+        be safe to run on another thread.
+        """
+        with self._lock:
+            state, value = self._lookup(key)
+            if state == 'fresh':
+                return value
+            flight = self._flights.get(key)
+            if state == 'stale' and refresh is not None:
+                self.stale_hits += 1
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                    threading.Thread(
+                        target=self._load,
+                        args=(key, flight, refresh, ttl, stale_ttl),
+                        daemon=True,
+                    ).start()
+                return value
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if leader:
+            self._load(key, flight, loader, ttl, stale_ttl)
+        return flight.result()
+
+    def _load(self, key, flight, loader, ttl, stale_ttl):
+        """Runs a loader for `key`, stores its value and wakes the waiters."""
+        try:
+            flight.value, tables = loader()
+            self.set(key, flight.value, tables, ttl, stale_ttl)
+        except Exception as exc:
+            flight.error = exc
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    async def get_or_load_async(self, key, loader, ttl=None, stale_ttl=0.0,
+                                refresh=None):
+        """
+        Coroutine version of get_or_load: `loader` and `refresh` are
+        coroutine functions, concurrent misses wait on one asyncio future,
+        and stale refreshes run as background tasks on the running loop.
+        If the caller running the load is cancelled, the callers waiting
+        on it are not: the next of them runs its own loader instead.
+        """
+        while True:
+            with self._lock:
+                state, value = self._lookup(key)
+                if state == 'fresh':
+                    return value
+                flight = self._async_flights.get(key)
+                if state == 'stale' and refresh is not None:
+                    self.stale_hits += 1
+                    if flight is None:
+                        flight = self._async_flights[key] = \
+                            asyncio.get_running_loop().create_future()
+                        task = asyncio.ensure_future(
+                            self._load_async(key, flight, refresh, ttl, stale_ttl))
+                        self._refreshes.add(task)
+                        task.add_done_callback(self._refreshes.discard)
+                    return value
+                leader = flight is None
+                if leader:
+                    flight = self._async_flights[key] = \
+                        asyncio.get_running_loop().create_future()
+                else:
+                    self.coalesced += 1
+            if leader:
+                await self._load_async(key, flight, loader, ttl, stale_ttl)
+            value = await asyncio.shield(flight)
+            if value is not _ABANDONED:
+                return value
+
+    async def _load_async(self, key, flight, loader, ttl, stale_ttl):
+        """Awaits a loader for `key`, stores its value and resolves the future."""
+        try:
+            value, tables = await loader()
+            self.set(key, value, tables, ttl, stale_ttl)
+            flight.set_result(value)
+        except asyncio.CancelledError:
+            # Only the loading caller was cancelled; wake the waiters so one
+            # of them retries rather than cancelling them all
+            flight.set_result(_ABANDONED)
+            raise
+        except Exception as exc:
+            flight.set_exception(exc)
+            # Nobody may be waiting (e.g. a failed background refresh)
+            flight.exception()
+        finally:
+            with self._lock:
+                self._async_flights.pop(key, None)
+
+    def set(self, key, value, tables=(), ttl=None, stale_ttl=0.0):
+        """
+        Stores a result; values larger than the whole budget are not cached.
+        The entry may be served stale for `stale_ttl` seconds after it expires.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        expires_at = stale_until = None
+        if ttl is not None:
+            expires_at = time.monotonic() + ttl
+            stale_until = expires_at + stale_ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CacheEntry(value, expires_at, stale_until,
+                                            frozenset(tables), size)
+            self._bytes += size
+            while (len(self._entries) > self.max_entries
+                   or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_tables(self, tables):
+        """Drops every entry that read from any of `tables`."""
+        tables = set(tables)
+        if not tables:
+            return
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if entry.tables & tables]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'coalesced': self.coalesced,
+                'stale_hits': self.stale_hits,
+            }
+
+
+# Process-wide cache used by cache_query and invalidated by transactional
+default_cache = QueryCache()
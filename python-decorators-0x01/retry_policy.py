@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Backoff, retry budget and error classification used by retry_on_failure
+"""
+import heapq
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+# Messages of sqlite3.OperationalError that describe a transient condition
+TRANSIENT_ERRORS = (
+    'database is locked',
+    'database table is locked',
+    'database is busy',
+    'disk i/o error',
+    'unable to open database file',
+)
+
+
+def is_retryable(exc):
+    """Returns True for errors that may succeed if the call is repeated."""
+    if isinstance(exc, sqlite3.OperationalError):
+        message = str(exc).lower()
+        return any(error in message for error in TRANSIENT_ERRORS)
+    return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+def should_retry(retry_on, exc):
+    """
+    Applies a retry_on setting, which is either a predicate taking the
+    exception or an exception class (or tuple of classes).
+    """
+    if isinstance(retry_on, type) or isinstance(retry_on, tuple):
+        return isinstance(exc, retry_on)
+    return retry_on(exc)
+
+
+def backoff_delay(attempt, base, cap, jitter=True):
+    """
+    Exponential backoff for the given 1-based attempt, capped at `cap`.
+    With jitter, a uniformly random delay between 0 and that value is used
+    ("full jitter"), so clients that failed together do not retry together.
+    """
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return random.uniform(0, delay) if jitter else delay
+
+
+class RetryBudget:
+    """
+    Token bucket limiting how many retries the whole process may make.
+    Each retry spends a token; tokens refill at `refill_rate` per second up
+    to `capacity`. When the bucket is empty, failures are raised at once
+    instead of adding more load to a struggling database.
+    """
+
+    def __init__(self, capacity=20, refill_rate=2.0, clock=time.monotonic):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def acquire(self):
+        """Spends one token, returning False when the budget is exhausted."""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens
+                               + (now - self._updated) * self.refill_rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self.rejected += 1
+            return False
+
+
+# Process-wide budget shared by every retry_on_failure decorator
+default_budget = RetryBudget()
+
+
+def simulate_outage(workers=100, outage=10.0, duration=30.0, think_time=1.0,
+                    retries=5, delay=0.5, max_delay=8.0, bucket=1.0):
+    """
+    Discrete-event simulation of `workers` clients that each send a request,
+    wait `think_time` seconds after it completes, and repeat. The database is
+    down for the first `outage` seconds. Prints the load on the database
+    (attempts per `bucket` seconds) for each retry strategy.
+    """
+    def run(jitter, use_budget):
+        clock = [0.0]
+        budget = RetryBudget(clock=lambda: clock[0]) if use_budget else None
+        events = [(random.uniform(0, think_time), worker, 0)
+                  for worker in range(workers)]
+        heapq.heapify(events)
+        load = Counter()
+        failed = 0
+        while events:
+            now, worker, attempt = heapq.heappop(events)
+            if now >= duration:
+                continue
+            clock[0] = now
+            load[int(now // bucket)] += 1
+            if now >= outage:
+                # Success: the worker sends its next request after thinking
+                heapq.heappush(events, (now + think_time, worker, 0))
+                continue
+            attempt += 1
+            if attempt > retries or (budget and not budget.acquire()):
+                failed += 1
+                heapq.heappush(events, (now + think_time, worker, 0))
+                continue
+            if jitter:
+                wait = backoff_delay(attempt, delay, max_delay)
+            else:
+                wait = delay
+            heapq.heappush(events, (now + wait, worker, attempt))
+        return load, failed
+
+    strategies = [
+        ('fixed delay', False, False),
+        ('backoff + full jitter', True, False),
+        ('backoff + full jitter + budget', True, True),
+    ]
+    buckets = range(int(duration // bucket))
+    for name, jitter, use_budget in strategies:
+        load, failed = run(jitter, use_budget)
+        during = sum(load[b] for b in buckets if b * bucket < outage)
+        print(f"{name}: {during} attempts during the outage, "
+              f"peak {max(load.values())} per {bucket:g}s, "
+              f"{failed} requests failed")
+        print("  " + " ".join(str(load[b]) for b in buckets))
+
+
+if __name__ == "__main__":
+    simulate_outage()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Tests for the circuit_breaker module.
+"""
+import asyncio
+import sqlite3
+import threading
+import unittest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+LOCKED = sqlite3.OperationalError("database is locked")
+
+
+class FakeClock:
+    """A clock the tests move forward by hand."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def failing():
+    raise LOCKED
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Tests `CircuitBreaker`."""
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+
+    def breaker(self, **options) -> CircuitBreaker:
+        options.setdefault('minimum_calls', 2)
+        options.setdefault('reset_timeout', 10)
+        return CircuitBreaker(clock=self.clock, **options)
+
+    def trip(self, breaker: CircuitBreaker) -> None:
+        call = breaker(failing)
+        for _ in range(breaker.minimum_calls):
+            with self.assertRaises(sqlite3.OperationalError):
+                call()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_opens_and_rejects(self) -> None:
+        """Enough failures open the circuit and later calls fail fast."""
+        breaker = self.breaker()
+        self.trip(breaker)
+        with self.assertRaises(CircuitOpenError):
+            breaker(lambda: 1)()
+
+    def test_probe_closes(self) -> None:
+        """A successful probe after reset_timeout closes the circuit."""
+        breaker = self.breaker()
+        self.trip(breaker)
+        self.clock.now = 10
+        self.assertEqual(breaker(lambda: 1)(), 1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_callback_may_read_stats(self) -> None:
+        """on_state_change runs without the lock held, so stats works."""
+        seen = []
+        breaker = self.breaker(
+            on_state_change=lambda b, previous, state: seen.append(b.stats['state']))
+        worker = threading.Thread(target=self.trip, args=(breaker,), daemon=True)
+        worker.start()
+        worker.join(5)
+        self.assertFalse(worker.is_alive(), "on_state_change deadlocked")
+        self.assertEqual(seen, [CircuitBreaker.OPEN])
+
+    def test_cancelled_probe_frees_slot(self) -> None:
+        """A probe cancelled by a timeout doesn't block later probes."""
+        breaker = self.breaker()
+        self.trip(breaker)
+        self.clock.now = 10
+
+        @breaker
+        async def query(delay):
+            await asyncio.sleep(delay)
+            return delay
+
+        async def run():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(query(1), 0.01)
+            return await query(0)
+
+        self.assertEqual(asyncio.run(run()), 0)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_stale_success_is_ignored(self) -> None:
+        """A call admitted before the circuit opened can't close it."""
+        breaker = self.breaker()
+        ticket = breaker.before_call()
+        self.trip(breaker)
+        self.clock.now = 10
+        breaker.before_call()  # moves to half-open and takes the probe slot
+        breaker.record(ticket=ticket)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Tests for the connection_pool module.
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from connection_pool import ConnectionPool, PoolTimeout
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Tests `ConnectionPool`."""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, 'pool.db')
+        conn = sqlite3.connect(self.database)
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def pool(self, **options) -> ConnectionPool:
+        pool = ConnectionPool(self.database, **options)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_timeout_when_exhausted(self) -> None:
+        """acquire raises PoolTimeout once every connection is in use."""
+        pool = self.pool(max_size=1)
+        with pool.connection():
+            with self.assertRaises(PoolTimeout):
+                pool.acquire(timeout=0.01)
+
+    def test_failed_reconnect_frees_slot(self) -> None:
+        """A reconnect that fails after a failed health check leaks no slot."""
+        pool = self.pool(min_size=1, max_size=1, health_check_interval=-1)
+        pool._idle[0][0].close()  # fails the health check
+        connect = pool._connect
+
+        def unreachable():
+            raise sqlite3.OperationalError("unable to open database file")
+
+        pool._connect = unreachable
+        with self.assertRaises(sqlite3.OperationalError):
+            pool.acquire(timeout=0.01)
+        self.assertEqual(pool.stats, {'size': 0, 'idle': 0})
+        pool._connect = connect
+        with pool.connection(timeout=0.01) as conn:
+            self.assertEqual(conn.execute("SELECT 1").fetchone(), (1,))
+
+    def test_release_rolls_back(self) -> None:
+        """A transaction left open by the borrower is rolled back."""
+        pool = self.pool(max_size=1)
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO items VALUES (1)")
+        with pool.connection() as conn:
+            self.assertFalse(conn.in_transaction)
+            self.assertEqual(
+                conn.execute("SELECT COUNT(*) FROM items").fetchone(), (0,))
+
+
+if __name__ == "__main__":
+    unittest.main()
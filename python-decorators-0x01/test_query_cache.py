@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Tests for the query cache and its use by cache_query and transactional.
+"""
+import asyncio
+import importlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+import connection_pool
+from connection_pool import get_pool
+from query_cache import (READ_ACTIONS, WRITE_ACTIONS, QueryCache,
+                         default_cache, track_tables)
+
+DATABASES = ('example.db', 'database.db')
+
+
+def create_users_db(path: str) -> None:
+    """Creates a users table with two rows at `path`."""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                 "name TEXT, email TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                     [(1, 'a', 'a@example.com'), (2, 'b', 'b@example.com')])
+    conn.commit()
+    conn.close()
+
+
+def setUpModule() -> None:
+    """
+    Runs the tests in a temporary directory holding the example.db and
+    database.db files the task scripts open, and imports them from there.
+    """
+    global transactional, cache_query, _cwd, _directory
+    _cwd = os.getcwd()
+    _directory = tempfile.TemporaryDirectory()
+    os.chdir(_directory.name)
+    for name in DATABASES:
+        create_users_db(name)
+    transactional = importlib.import_module('2-transactional')
+    cache_query = importlib.import_module('4-cache_query')
+
+
+def tearDownModule() -> None:
+    """Closes the pools opened on the temporary databases."""
+    for name in DATABASES:
+        connection_pool._pools.pop(name).close()
+    os.chdir(_cwd)
+    _directory.cleanup()
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Starts every test with an empty cache."""
+
+    def setUp(self) -> None:
+        default_cache.clear()
+
+
+class TestTrackTables(DatabaseTestCase):
+    """Tests `track_tables`."""
+
+    def test_nested_trackers(self) -> None:
+        """An inner read tracker doesn't stop the outer write tracker."""
+        conn = sqlite3.connect('example.db')
+        with track_tables(conn, WRITE_ACTIONS) as written:
+            with track_tables(conn, READ_ACTIONS) as read:
+                conn.execute("SELECT * FROM users").fetchall()
+            conn.execute("UPDATE users SET name = name")
+        conn.rollback()
+        conn.close()
+        self.assertEqual(read, {'users'})
+        self.assertEqual(written, {'users'})
+
+
+class TestQueryCache(unittest.TestCase):
+    """Tests `QueryCache.get_or_load`."""
+
+    def test_concurrent_misses_load_once(self) -> None:
+        """Threads missing the same key share one load."""
+        cache = QueryCache()
+        release = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(True)
+            release.wait(5)
+            return 'rows', {'users'}
+
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(cache.get_or_load('k', loader)))
+            for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while cache.coalesced < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, ['rows'] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_stale_result_served_while_refreshing(self) -> None:
+        """An expired entry within stale_ttl is returned and refreshed."""
+        cache = QueryCache()
+        refreshed = threading.Event()
+
+        def refresh():
+            refreshed.set()
+            return 'new', set()
+
+        cache.set('k', 'old', ttl=0.01, stale_ttl=60)
+        time.sleep(0.02)
+        self.assertEqual(
+            cache.get_or_load('k', refresh, ttl=60, refresh=refresh), 'old')
+        self.assertTrue(refreshed.wait(5))
+        while 'k' in cache._flights:
+            time.sleep(0.001)
+        self.assertEqual(cache.get('k'), 'new')
+        self.assertEqual(cache.stale_hits, 1)
+
+    def test_cancelled_async_leader_spares_waiters(self) -> None:
+        """A waiter takes over the load when the loading caller is cancelled."""
+        cache = QueryCache()
+
+        async def slow():
+            await asyncio.sleep(5)
+            return 'slow', set()
+
+        async def fast():
+            return 'fast', set()
+
+        async def run():
+            leader = asyncio.ensure_future(cache.get_or_load_async('k', slow))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(cache.get_or_load_async('k', fast))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await asyncio.wait_for(waiter, 5)
+
+        self.assertEqual(asyncio.run(run()), 'fast')
+
+
+class TestCacheQuery(DatabaseTestCase):
+    """Tests `cache_query` together with `transactional`."""
+
+    def fetch(self):
+        @cache_query.cache_query
+        def fetch(conn, query):
+            return conn.execute(query).fetchall()
+        return fetch
+
+    def test_rollback_leaves_no_dirty_result(self) -> None:
+        """Reads inside a rolled-back transaction are not served later."""
+        fetch = self.fetch()
+        query = "SELECT name FROM users WHERE id = 1"
+
+        @transactional.with_db_connection
+        @transactional.transactional
+        def ghost(conn):
+            conn.execute("UPDATE users SET name = 'GHOST' WHERE id = 1")
+            self.assertEqual(fetch(conn, query), [('GHOST',)])
+            raise ValueError("roll back")
+
+        with self.assertRaises(ValueError):
+            ghost()
+        with get_pool('example.db').connection() as conn:
+            self.assertEqual(fetch(conn, query), [('a',)])
+
+    def test_key_includes_database(self) -> None:
+        """The same SQL on two databases is cached separately."""
+        fetch = self.fetch()
+        with get_pool('database.db').connection() as conn:
+            conn.execute("UPDATE users SET name = 'other' WHERE id = 1")
+            conn.commit()
+        query = "SELECT name FROM users WHERE id = 1"
+        with get_pool('example.db').connection() as conn:
+            self.assertEqual(fetch(conn, query), [('a',)])
+        with get_pool('database.db').connection() as conn:
+            self.assertEqual(fetch(conn, query), [('other',)])
+
+
+if __name__ == "__main__":
+    unittest.main()
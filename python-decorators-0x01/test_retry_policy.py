@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Tests for retry_policy and its use by retry_on_failure.
+"""
+import importlib
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import connection_pool
+from retry_policy import RetryBudget, backoff_delay, is_retryable
+
+LOCKED = sqlite3.OperationalError("database is locked")
+
+
+def setUpModule() -> None:
+    """
+    Imports 3-retry_on_failure from a temporary directory holding the
+    example.db its demo call reads.
+    """
+    global retry, _cwd, _directory
+    _cwd = os.getcwd()
+    _directory = tempfile.TemporaryDirectory()
+    os.chdir(_directory.name)
+    conn = sqlite3.connect('example.db')
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+    conn.commit()
+    conn.close()
+    retry = importlib.import_module('3-retry_on_failure')
+
+
+def tearDownModule() -> None:
+    pool = connection_pool._pools.pop('example.db', None)
+    if pool is not None:
+        pool.close()
+    os.chdir(_cwd)
+    _directory.cleanup()
+
+
+class FakeClock:
+    """A clock the tests move forward by hand."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Tests the backoff, budget and classification helpers."""
+
+    def test_backoff_doubles_up_to_cap(self) -> None:
+        """Delays double per attempt and never exceed the cap."""
+        delays = [backoff_delay(n, 1, 5, jitter=False) for n in range(1, 5)]
+        self.assertEqual(delays, [1, 2, 4, 5])
+        self.assertLessEqual(backoff_delay(10, 1, 5), 5)
+
+    def test_budget_refills(self) -> None:
+        """An exhausted budget rejects retries until tokens refill."""
+        clock = FakeClock()
+        budget = RetryBudget(capacity=2, refill_rate=1.0, clock=clock)
+        self.assertEqual([budget.acquire() for _ in range(3)],
+                         [True, True, False])
+        self.assertEqual(budget.rejected, 1)
+        clock.now = 1
+        self.assertTrue(budget.acquire())
+
+    def test_only_transient_errors_are_retryable(self) -> None:
+        """Lock contention is retried, a syntax error is not."""
+        self.assertTrue(is_retryable(LOCKED))
+        self.assertFalse(is_retryable(sqlite3.OperationalError("syntax error")))
+
+
+class TestRetryOnFailure(unittest.TestCase):
+    """Tests `retry_on_failure`."""
+
+    def flaky(self, failures, **options):
+        calls = []
+
+        @retry.retry_on_failure(delay=0, **options)
+        def query():
+            calls.append(True)
+            if len(calls) <= failures:
+                raise LOCKED
+            return len(calls)
+        return query, calls
+
+    def test_retries_transient_errors(self) -> None:
+        """A call that fails twice succeeds on the third attempt."""
+        query, _ = self.flaky(2, budget=None)
+        self.assertEqual(query(), 3)
+
+    def test_empty_budget_stops_retries(self) -> None:
+        """With no tokens left the first failure is raised."""
+        budget = RetryBudget(capacity=0, clock=FakeClock())
+        query, calls = self.flaky(1, budget=budget)
+        with self.assertRaises(sqlite3.OperationalError):
+            query()
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Tests for savepoint nesting and group commit in transactional.
+"""
+import importlib
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+import connection_pool
+
+
+def setUpModule() -> None:
+    """
+    Imports 2-transactional from a temporary directory holding the
+    example.db its demo call updates.
+    """
+    global transactional, _cwd, _directory
+    _cwd = os.getcwd()
+    _directory = tempfile.TemporaryDirectory()
+    os.chdir(_directory.name)
+    conn = sqlite3.connect('example.db')
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+    conn.commit()
+    conn.close()
+    transactional = importlib.import_module('2-transactional')
+
+
+def tearDownModule() -> None:
+    pool = connection_pool._pools.pop('example.db', None)
+    if pool is not None:
+        pool.close()
+    os.chdir(_cwd)
+    _directory.cleanup()
+
+
+class TestTransactional(unittest.TestCase):
+    """Tests `transactional`."""
+
+    def setUp(self) -> None:
+        self.path = os.path.join(_directory.name, f"{self.id()}.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.commit()
+        conn.close()
+
+    def names(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return [name for name, in conn.execute(
+                "SELECT name FROM items ORDER BY id")]
+        finally:
+            conn.close()
+
+    def test_nested_failure_rolls_back_only_inner(self) -> None:
+        """A failing nested call undoes only its own writes."""
+        @transactional.transactional
+        def inner(conn):
+            conn.execute("INSERT INTO items (name) VALUES ('inner')")
+            raise ValueError("inner fails")
+
+        @transactional.transactional
+        def outer(conn):
+            conn.execute("INSERT INTO items (name) VALUES ('outer')")
+            with self.assertRaises(ValueError):
+                inner(conn)
+
+        conn = sqlite3.connect(self.path)
+        outer(conn)
+        conn.close()
+        self.assertEqual(self.names(), ['outer'])
+        self.assertEqual(transactional._depths, {})
+
+    def test_group_commit_batches(self) -> None:
+        """Calls share commits and leave no nesting state behind."""
+        group = transactional.GroupCommit(self.path, max_batch=5, max_delay=60)
+
+        @transactional.transactional(group_commit=group)
+        def add(conn, name):
+            conn.execute("INSERT INTO items (name) VALUES (?)", (name,))
+
+        for i in range(10):
+            add(None, f"item{i}")
+        group.close()
+        self.assertEqual(group.commits, 2)
+        self.assertEqual(len(self.names()), 10)
+        self.assertEqual(transactional._depths, {})
+
+    def test_waiter_sees_its_own_batch_fail(self) -> None:
+        """
+        A waiter whose batch failed to commit raises, even when a later
+        batch committed before it woke up.
+        """
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE parents (id INTEGER PRIMARY KEY)")
+        conn.execute("CREATE TABLE children (parent INTEGER REFERENCES "
+                     "parents (id) DEFERRABLE INITIALLY DEFERRED)")
+        conn.commit()
+        conn.close()
+        group = transactional.GroupCommit(self.path, max_batch=2, max_delay=60)
+        group.connection.execute("PRAGMA foreign_keys=ON")
+
+        @transactional.transactional(group_commit=group, wait=True)
+        def orphan(conn):
+            # Violates the deferred foreign key, so the commit fails
+            conn.execute("INSERT INTO children VALUES (42)")
+
+        @transactional.transactional(group_commit=group)
+        def add(conn, name):
+            conn.execute("INSERT INTO items (name) VALUES (?)", (name,))
+
+        errors = []
+
+        def waiter():
+            try:
+                orphan(None)
+            except sqlite3.Error as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=waiter, daemon=True)
+        thread.start()
+        while not group._waiting:
+            pass
+        # Holding the lock, fail the waiter's batch and then commit another
+        # before the waiter can wake up
+        with group._condition:
+            add(None, 'fails with the orphan')
+            add(None, 'committed')
+            group.flush()
+        thread.join(5)
+        group.close()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(self.names(), ['committed'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,202 @@
+import os
+import resource
 import sqlite3
+import sys
+import time
+import uuid
+from multiprocessing import Pool
 
-def stream_users():
-    conn = sqlite3.connect('user_data.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM user_data")
-    for row in cursor:
-        yield row
-    conn.close()
+SQLITE_DB = 'user_data.db'
+QUERY = "SELECT * FROM user_data"
+DEFAULT_ARRAYSIZE = 1000
+
+
+def _sqlite_rows(arraysize, query=QUERY, params=()):
+    """
+    Streams rows from SQLite, pulling `arraysize` rows per fetch so the
+    cursor never holds more than one chunk of the result set.
+    """
+    conn = sqlite3.connect(SQLITE_DB)
+    try:
+        cursor = conn.cursor()
+        cursor.arraysize = arraysize
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def _mysql_rows(arraysize, query=QUERY, params=()):
+    """
+    Streams rows from MySQL (ALX_prodev) through an unbuffered cursor.
+    Rows are read off the socket as they are fetched instead of the whole
+    result set being loaded client-side first.
+    """
+    import seed
+    conn = seed.connect_to_prodev()
+    exhausted = False
+    try:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(arraysize)
+            if not rows:
+                break
+            yield from rows
+        exhausted = True
+        cursor.close()
+    finally:
+        if exhausted:
+            conn.close()
+        else:
+            # Unread rows are still on the wire; a normal close would try
+            # to drain them, so drop the socket instead.
+            conn.shutdown()
+
+
+BACKENDS = {
+    'sqlite': _sqlite_rows,
+    'mysql': _mysql_rows,
+}
+
+# Parameter marker and indexed key used to split the table into ranges
+PLACEHOLDERS = {'sqlite': '?', 'mysql': '%s'}
+PARTITION_KEYS = {'sqlite': 'rowid', 'mysql': 'user_id'}
+
+
+def stream_users(backend='sqlite', arraysize=DEFAULT_ARRAYSIZE):
+    """
+    Generator that yields rows from the user_data table one by one.
+
+    Args:
+        backend: Name of a streaming backend registered in BACKENDS
+        arraysize: Number of rows pulled from the database per fetch
+    """
+    try:
+        rows = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown backend: {backend}") from None
+    yield from rows(arraysize)
+
+
+def _first_row(backend, query):
+    """Runs a query through a backend and returns its first row (or None)."""
+    rows = BACKENDS[backend](1, query)
+    try:
+        return next(rows, None)
+    finally:
+        rows.close()
+
+
+def _key_to_int(value):
+    """Maps a key onto an integer range: ints as-is, UUID strings by value."""
+    if isinstance(value, int):
+        return value, int
+    try:
+        return uuid.UUID(value).int, lambda number: str(uuid.UUID(int=number))
+    except (AttributeError, TypeError, ValueError):
+        return None, None
+
+
+def _partition_bounds(backend, key, partitions):
+    """
+    Splits the key space into `partitions` ranges by interpolating between
+    the smallest and largest key, each read with a single index seek, so
+    no rows are walked. Ranges hold similar row counts when keys are spread
+    evenly over their range, as rowids and random (uuid4) user_ids are.
+    Keys that are neither integers nor UUIDs are not split.
+    Returns (low, high) pairs; low is inclusive, high exclusive, and None
+    leaves that end open.
+    """
+    # Separate queries: SQLite only optimises a lone MIN() or MAX() to a seek
+    low = _first_row(backend, f"SELECT MIN({key}) FROM user_data")
+    high = _first_row(backend, f"SELECT MAX({key}) FROM user_data")
+    if low is None or low[0] is None:
+        return [(None, None)]
+    low, to_key = _key_to_int(low[0])
+    high, _ = _key_to_int(high[0])
+    if low is None or high is None:
+        return [(None, None)]
+    splits = []
+    for i in range(1, partitions):
+        split = low + (high - low) * i // partitions
+        if split > low and (not splits or split > splits[-1]):
+            splits.append(split)
+    bounds = [None] + [to_key(split) for split in splits] + [None]
+    return list(zip(bounds, bounds[1:]))
+
+
+def _scan_partition(task):
+    """
+    Worker entry point: streams one key range in its own connection and
+    returns process(rows).
+    """
+    process, backend, key, arraysize, (low, high) = task
+    marker = PLACEHOLDERS[backend]
+    conditions, params = [], []
+    if low is not None:
+        conditions.append(f"{key} >= {marker}")
+        params.append(low)
+    if high is not None:
+        conditions.append(f"{key} < {marker}")
+        params.append(high)
+    query = QUERY
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return process(BACKENDS[backend](arraysize, query, tuple(params)))
+
+
+def partitioned_scan(process, partitions=None, backend='sqlite',
+                     ordered=True, arraysize=DEFAULT_ARRAYSIZE):
+    """
+    Generator that scans user_data in parallel across a process pool.
+
+    The table is split into key ranges (rowid on SQLite, user_id on MySQL).
+    Each range is streamed by a worker process with its own connection
+    and reduced with `process`, which receives an iterator of rows and must
+    be a picklable module-level function.
+
+    Args:
+        process: Function applied to each range's row iterator
+        partitions: Number of key ranges (defaults to the CPU count)
+        backend: Name of a streaming backend registered in BACKENDS
+        ordered: Yield results in key order rather than as they finish
+        arraysize: Number of rows pulled from the database per fetch
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}")
+    partitions = partitions or os.cpu_count() or 1
+    key = PARTITION_KEYS[backend]
+    tasks = [(process, backend, key, arraysize, bounds)
+             for bounds in _partition_bounds(backend, key, partitions)]
+    with Pool(min(partitions, len(tasks))) as pool:
+        if ordered:
+            results = pool.imap(_scan_partition, tasks)
+        else:
+            results = pool.imap_unordered(_scan_partition, tasks)
+        yield from results
+
+
+def benchmark(backend='sqlite', arraysize=DEFAULT_ARRAYSIZE):
+    """
+    Streams the whole table and reports rows/sec and peak RSS.
+    Run one backend per process, since peak RSS is process-wide.
+    """
+    count = 0
+    start = time.perf_counter()
+    for _ in stream_users(backend, arraysize):
+        count += 1
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"{backend}: {count} rows in {elapsed:.2f}s "
+          f"({rate:,.0f} rows/sec), peak RSS {peak_rss / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    benchmark(*sys.argv[1:2])
@@ -1,30 +1,187 @@
 import sqlite3
+from array import array
+from decimal import Decimal
+from itertools import accumulate
 
-def stream_users_in_batches(batch_size):
+COLUMNS = ('user_id', 'name', 'email', 'age')
+
+
+class Predicate:
+    """
+    A SQL boolean expression together with its bound parameters.
+    Predicates combine with & (AND), | (OR) and ~ (NOT).
+    """
+
+    def __init__(self, sql, params=()):
+        self.sql = sql
+        self.params = tuple(params)
+
+    def __and__(self, other):
+        return Predicate(f"({self.sql} AND {other.sql})",
+                         self.params + other.params)
+
+    def __or__(self, other):
+        return Predicate(f"({self.sql} OR {other.sql})",
+                         self.params + other.params)
+
+    def __invert__(self):
+        return Predicate(f"(NOT {self.sql})", self.params)
+
+    def __repr__(self):
+        return f"Predicate({self.sql!r}, {self.params!r})"
+
+
+class Column:
+    """
+    A user_data column; comparing it with a value builds a Predicate,
+    e.g. Column('age') > 25 compiles to "age > ?" with params (25,).
+    """
+    __hash__ = None
+
+    def __init__(self, name):
+        if name not in COLUMNS:
+            raise ValueError(f"Unknown column: {name}")
+        self.name = name
+
+    def _compare(self, operator, value):
+        return Predicate(f"{self.name} {operator} ?", (value,))
+
+    def __gt__(self, value):
+        return self._compare('>', value)
+
+    def __ge__(self, value):
+        return self._compare('>=', value)
+
+    def __lt__(self, value):
+        return self._compare('<', value)
+
+    def __le__(self, value):
+        return self._compare('<=', value)
+
+    def __eq__(self, value):
+        return self._compare('=', value)
+
+    def __ne__(self, value):
+        return self._compare('<>', value)
+
+    def between(self, low, high):
+        return Predicate(f"{self.name} BETWEEN ? AND ?", (low, high))
+
+    def isin(self, values):
+        values = tuple(values)
+        if not values:
+            return Predicate("0")
+        markers = ", ".join("?" * len(values))
+        return Predicate(f"{self.name} IN ({markers})", values)
+
+
+class StringColumn:
+    """
+    A column of strings stored as one UTF-8 buffer plus an array of
+    len + 1 offsets; value i is data[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, values):
+        encoded = [value.encode('utf-8') for value in values]
+        self.offsets = array('q', accumulate(map(len, encoded), initial=0))
+        self.data = b"".join(encoded)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.data[start:end].decode('utf-8')
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def _to_column(values):
+    """
+    Packs a sequence of cell values into the tightest typed container:
+    array('q') for integers, array('d') for other numbers, StringColumn for
+    strings. Columns with mixed types or NULLs stay a plain list.
+    """
+    kinds = {type(value) for value in values}
+    if kinds <= {int}:
+        return array('q', values)
+    if kinds <= {int, float, Decimal}:
+        return array('d', map(float, values))
+    if kinds <= {str}:
+        return StringColumn(values)
+    return list(values)
+
+
+class ColumnarBatch:
+    """
+    A batch of rows stored column by column. Numeric columns are
+    array.array buffers, so they can be summed directly or wrapped
+    zero-copy with numpy.frombuffer where NumPy is available.
+    """
+
+    def __init__(self, names, rows):
+        self.names = tuple(names)
+        self.length = len(rows)
+        self.columns = {
+            name: _to_column(values)
+            for name, values in zip(self.names, zip(*rows))
+        }
+        if not rows:
+            self.columns = {name: [] for name in self.names}
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def rows(self):
+        """Yields the batch back as row tuples."""
+        return zip(*(self.columns[name] for name in self.names))
+
+
+def stream_users_in_batches(batch_size, where=None, columnar=False,
+                            columns=None):
     """
     Generator that yields batches of users from the 'users' table.
-    Each batch is a list of rows (tuples).
+    Each batch is a list of rows (tuples), or a ColumnarBatch when
+    `columnar` is set.
+    An optional Predicate is compiled into the WHERE clause, so only
+    qualifying rows leave the database; `columns` limits the SELECT list.
     """
+    if columns is None:
+        select = "*"
+    else:
+        select = ", ".join(Column(name).name for name in columns)
+    query = f"SELECT {select} FROM user_data"
+    params = ()
+    if where is not None:
+        query += f" WHERE {where.sql}"
+        params = where.params
     conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM user_data")
-    while True:
-        batch = cursor.fetchmany(batch_size)
-        if not batch:
-            break
-        yield batch
-    conn.close()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        names = [column[0] for column in cursor.description]
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield ColumnarBatch(names, batch) if columnar else batch
+    finally:
+        conn.close()
+
 
-def batch_processing(batch_size):
+def batch_processing(batch_size, where=None):
     """
     Processes each batch to filter users over the age of 25.
-    Yields users (rows) where age > 25.
+    Yields users (rows) where age > 25, or matching `where` when given.
+    The filter runs in SQL, so discarded rows are never transferred.
     """
-    for batch in stream_users_in_batches(batch_size):
+    if where is None:
+        where = Column('age') > 25
+    for batch in stream_users_in_batches(batch_size, where):
         for user in batch:
-            # Assuming the 'age' column is at index 2 (adjust if needed)
-            if user[2] > 25:
-                                yield user
-                
-            # Dummy return to satisfy checker requirement
-            return
+            yield user
@@ -1,21 +1,201 @@
-def paginate_users(page_size, offset):
+import base64
+import bisect
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+# Example data source used when no connection is given: 100 users with IDs 1 to 100
+USERS = list(range(1, 101))
+
+
+def _placeholder(connection):
+    """Returns the parameter marker used by the connection's driver."""
+    return '?' if isinstance(connection, sqlite3.Connection) else '%s'
+
+
+def _row_key(row):
+    """Returns the user_id of a row (simulated rows are the ID itself)."""
+    return row[0] if isinstance(row, (tuple, list)) else row
+
+
+def encode_cursor(key):
+    """Encodes a user_id into an opaque, resumable cursor token."""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(token):
+    """Decodes a cursor token produced by encode_cursor."""
+    return json.loads(base64.urlsafe_b64decode(token.encode()))
+
+
+def page_cursor(page):
+    """Returns the token that resumes pagination right after `page`."""
+    return encode_cursor(_row_key(page[-1]))
+
+
+def paginate_users(page_size, offset, connection=None):
     """
     Simulates fetching a page of users from a data source.
     Returns a list of user IDs starting from offset, up to page_size items.
+    When a connection is given, runs:
+        SELECT * FROM user_data ORDER BY user_id LIMIT page_size OFFSET offset
+    """
+    if connection is None:
+        return USERS[offset:offset + page_size]
+    cursor = connection.cursor()
+    cursor.execute(
+        f"SELECT * FROM user_data ORDER BY user_id "
+        f"LIMIT {int(page_size)} OFFSET {int(offset)}"
+    )
+    page = cursor.fetchall()
+    cursor.close()
+    return page
+
+
+def seek_users(page_size, after=None, connection=None):
+    """
+    Fetches the page of users whose user_id follows `after` (keyset pagination).
+    Seeking on the indexed key costs the same for every page, unlike OFFSET,
+    which has to walk past every skipped row.
+    """
+    if connection is None:
+        start = 0 if after is None else bisect.bisect_right(USERS, after)
+        return USERS[start:start + page_size]
+    cursor = connection.cursor()
+    if after is None:
+        cursor.execute(
+            f"SELECT * FROM user_data ORDER BY user_id LIMIT {int(page_size)}"
+        )
+    else:
+        cursor.execute(
+            f"SELECT * FROM user_data WHERE user_id > {_placeholder(connection)} "
+            f"ORDER BY user_id LIMIT {int(page_size)}",
+            (after,)
+        )
+    page = cursor.fetchall()
+    cursor.close()
+    return page
+
+
+def _fetch_pages(page_size, mode, cursor, connection):
+    """
+    Generator that fetches pages one by one using the given pagination mode.
     """
-    # Example data source: 100 users with IDs 1 to 100
-    # SELECT * FROM user_data LIMIT page_size OFFSET offset
-    users = list(range(1, 101))
-    return users[offset:offset + page_size]
+    if mode == 'offset':
+        offset = 0
+        while True:
+            page = paginate_users(page_size, offset, connection)
+            if not page:
+                break
+            yield page
+            offset += page_size
+    elif mode == 'keyset':
+        after = decode_cursor(cursor) if cursor is not None else None
+        while True:
+            page = seek_users(page_size, after, connection)
+            if not page:
+                break
+            yield page
+            after = _row_key(page[-1])
+    else:
+        raise ValueError(f"Unknown pagination mode: {mode}")
+
+
+_DONE = object()
+
 
-def lazy_paginate(page_size):
+def _read_ahead(pages, depth):
+    """
+    Generator that fetches up to `depth` pages ahead of the consumer on a
+    background thread. The bounded queue blocks the fetcher once it is
+    `depth` pages ahead, so at most depth + 2 pages are held in memory.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch():
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+            put(_DONE)
+        except Exception as exc:
+            put(exc)
+        finally:
+            pages.close()
+
+    worker = threading.Thread(target=fetch, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        worker.join()
+
+
+def lazy_paginate(page_size, mode='offset', cursor=None, connection=None,
+                  prefetch=0):
     """
     Generator that yields pages of users, fetching each page only when needed.
+
+    Args:
+        page_size: Number of users per page
+        mode: 'offset' for LIMIT/OFFSET paging, 'keyset' to seek on user_id
+        cursor: Token from page_cursor() to resume a keyset pagination
+        connection: Optional DB-API connection holding the user_data table
+        prefetch: Number of pages to fetch ahead on a background thread while
+            the current page is processed (0 disables read-ahead). An SQLite
+            connection must be opened with check_same_thread=False.
     """
-    offset = 0
-    while True:
-        page = paginate_users(page_size, offset)
-        if not page:
-            break
-        yield page
-        offset += page_size
+    pages = _fetch_pages(page_size, mode, cursor, connection)
+    if prefetch > 0:
+        pages = _read_ahead(pages, prefetch)
+    yield from pages
+
+
+def benchmark(sizes=(10_000, 50_000, 100_000), page_size=100):
+    """
+    Pages through in-memory user_data tables of increasing size and compares
+    the total time taken by OFFSET and keyset pagination.
+    """
+    for size in sizes:
+        connection = sqlite3.connect(":memory:")
+        connection.execute(
+            "CREATE TABLE user_data ("
+            "user_id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)"
+        )
+        connection.executemany(
+            "INSERT INTO user_data VALUES (?, ?, ?, ?)",
+            ((i, f"user{i}", f"user{i}@example.com", 18 + i % 80)
+             for i in range(1, size + 1))
+        )
+        timings = {}
+        for mode in ('offset', 'keyset'):
+            start = time.perf_counter()
+            for _ in lazy_paginate(page_size, mode, connection=connection):
+                pass
+            timings[mode] = time.perf_counter() - start
+        connection.close()
+        print(f"{size:>9} rows: offset {timings['offset']:.3f}s, "
+              f"keyset {timings['keyset']:.3f}s")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,3 +1,16 @@
+import math
+import numbers
+import random
+import sqlite3
+import sys
+import time
+from array import array
+from itertools import chain
+
+# Marks an exhausted source, since None is a valid (NULL) age
+_MISSING = object()
+
+
 def stream_user_ages():
     # Example: Simulate streaming ages from a large dataset
     # Replace this with actual data source in real use
@@ -5,14 +18,218 @@ def stream_user_ages():
     for age in ages:
         yield age
 
+
+def _nearest_rank(count, percentile):
+    """Returns the 0-based index of a percentile using the nearest-rank method."""
+    return min(max(math.ceil(percentile / 100 * count) - 1, 0), count - 1)
+
+
+def _percentiles(values, percentiles):
+    """Computes nearest-rank percentiles over collected values."""
+    if not percentiles or not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        f"p{p:g}": ordered[_nearest_rank(len(ordered), p)]
+        for p in percentiles
+    }
+
+
+def _empty_result():
+    return {'count': 0, 'sum': 0, 'avg': 0, 'min': None, 'max': None}
+
+
+def aggregate_sql(connection, percentiles=(), table='user_data',
+                  column='age'):
+    """
+    Pushes the aggregation down to the database, so only the results
+    cross the connection.
+    """
+    cursor = connection.cursor()
+    cursor.execute(
+        f"SELECT COUNT({column}), SUM({column}), AVG({column}), "
+        f"MIN({column}), MAX({column}) FROM {table}"
+    )
+    count, total, average, smallest, largest = cursor.fetchone()
+    result = {'count': count, 'sum': total or 0, 'avg': average or 0,
+              'min': smallest, 'max': largest}
+    for p in percentiles if count else ():
+        cursor.execute(
+            f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL "
+            f"ORDER BY {column} LIMIT 1 OFFSET {_nearest_rank(count, p)}"
+        )
+        result[f"p{p:g}"] = cursor.fetchone()[0]
+    cursor.close()
+    return result
+
+
+def aggregate_columnar(batches, percentiles=(), column='age'):
+    """
+    Aggregates columnar batches (see ColumnarBatch in 1-batch_processing)
+    with one sum/min/max call per batch instead of one Python step per row.
+    NULLs are skipped, as SQL aggregates do.
+    """
+    result = _empty_result()
+    collected = array('d')
+    for batch in batches:
+        values = batch[column]
+        if isinstance(values, list):
+            # Columns holding NULLs are left as plain lists; drop the NULLs
+            # and use floats like array('d') columns, so Decimal ages from
+            # such a batch can be added to those from a packed one
+            values = [float(value) for value in values if value is not None]
+        if not len(values):
+            continue
+        result['count'] += len(values)
+        result['sum'] += sum(values)
+        smallest, largest = min(values), max(values)
+        if result['min'] is None or smallest < result['min']:
+            result['min'] = smallest
+        if result['max'] is None or largest > result['max']:
+            result['max'] = largest
+        if percentiles:
+            collected.extend(values)
+    if result['count']:
+        result['avg'] = result['sum'] / result['count']
+    result.update(_percentiles(collected, percentiles))
+    return result
+
+
+class OnlineStats:
+    """
+    Running count, sum, min, max, mean and variance over a stream of values,
+    using Welford's algorithm so the variance stays numerically stable.
+    Values may be ints, floats or Decimals (as seed.py stores ages); the sum
+    keeps their own type, while mean and variance are computed in float.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def update(self, value):
+        self.count += 1
+        self.total += value
+        number = float(value)
+        delta = number - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (number - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+
+def aggregate_online(values, percentiles=()):
+    """
+    Aggregates a stream of scalar values in a single pass. Values are only
+    kept (as a compact array) when percentiles are requested. NULLs (None)
+    are skipped, as SQL aggregates do.
+    """
+    stats = OnlineStats()
+    collected = array('d')
+    for value in values:
+        if value is None:
+            continue
+        stats.update(value)
+        if percentiles:
+            collected.append(value)
+    result = _empty_result()
+    if stats.count:
+        result.update(count=stats.count, sum=stats.total,
+                      avg=stats.total / stats.count,
+                      min=stats.min, max=stats.max, variance=stats.variance)
+    result.update(_percentiles(collected, percentiles))
+    return result
+
+
+def aggregate_ages(source=None, percentiles=(), mode=None):
+    """
+    Computes count, sum, avg, min, max and the requested percentiles of
+    user ages, picking the cheapest mode for the source:
+
+    - 'sql' for a DB-API connection (aggregation runs in the database)
+    - 'columnar' for an iterable of columnar batches
+    - 'online' for a stream of scalar ages (the default source)
+
+    NULL ages are ignored, as SQL's AVG ignores them.
+    """
+    if source is None:
+        source = stream_user_ages()
+    if mode is None:
+        if hasattr(source, 'cursor'):
+            mode = 'sql'
+        else:
+            # Leading NULLs would be skipped anyway, so they can be dropped
+            source = iter(source)
+            first = next(source, _MISSING)
+            while first is None:
+                first = next(source, _MISSING)
+            if first is _MISSING:
+                return _empty_result()
+            source = chain([first], source)
+            if isinstance(first, numbers.Number):
+                mode = 'online'
+            else:
+                mode = 'columnar'
+    if mode == 'sql':
+        return aggregate_sql(source, percentiles)
+    if mode == 'columnar':
+        return aggregate_columnar(source, percentiles)
+    if mode == 'online':
+        return aggregate_online(source, percentiles)
+    raise ValueError(f"Unknown aggregation mode: {mode}")
+
+
 def calculate_average_age():
-    total = 0
-    count = 0
-    for age in stream_user_ages():
-        total += age
-        count += 1
-    average = total / count if count > 0 else 0
+    average = aggregate_ages()['avg']
     print(f"Average age of users: {average}")
 
+
+def benchmark(size=1_000_000, batch_size=10_000):
+    """
+    Compares the original one-int-at-a-time loop with each aggregation mode
+    over the same `size` ages.
+    """
+    ages = [random.randint(18, 90) for _ in range(size)]
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE user_data (age INTEGER)")
+    connection.executemany("INSERT INTO user_data VALUES (?)",
+                           ((age,) for age in ages))
+    batches = [{'age': array('q', ages[i:i + batch_size])}
+               for i in range(0, size, batch_size)]
+
+    def loop():
+        total = 0
+        count = 0
+        for age in ages:
+            total += age
+            count += 1
+        return total / count
+
+    runs = [
+        ('loop', loop),
+        ('sql', lambda: aggregate_ages(connection)),
+        ('columnar', lambda: aggregate_ages(batches)),
+        ('online', lambda: aggregate_ages(ages)),
+    ]
+    for name, run in runs:
+        start = time.perf_counter()
+        run()
+        print(f"{name:>8}: {time.perf_counter() - start:.3f}s")
+    connection.close()
+
+
 if __name__ == "__main__":
-    calculate_average_age()
+    if sys.argv[1:] == ['benchmark']:
+        benchmark()
+    else:
+        calculate_average_age()
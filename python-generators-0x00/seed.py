@@ -1,5 +1,12 @@
 import csv
+import glob
+import os
+import sys
+import time
 import uuid
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from multiprocessing import Pool
 from mysql.connector import errorcode
 
 import mysql.connector
@@ -7,6 +14,8 @@ import mysql.connector
 DB_NAME = 'ALX_prodev'
 TABLE_NAME = 'user_data'
 CSV_FILE = 'user_data.csv'
+STAGING_TABLE = 'user_data_staging'
+BATCH_SIZE = 1000
 
 def connect_db():
     return mysql.connector.connect(
@@ -22,12 +31,13 @@ def create_database(connection):
     finally:
         cursor.close()
 
-def connect_to_prodev():
+def connect_to_prodev(**options):
     return mysql.connector.connect(
         host='localhost',
         user='root',
         password='your_password',  # Change to your MySQL root password
-        database=DB_NAME
+        database=DB_NAME,
+        **options
     )
 
 def create_table(connection):
@@ -46,23 +56,233 @@ def create_table(connection):
     finally:
         cursor.close()
 
-def insert_data(connection, data):
+def ensure_email_index(connection):
+    """
+    Adds the unique email index used to skip duplicates on insert.
+    Tables created before the index existed get it added here.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"CREATE UNIQUE INDEX idx_email ON {TABLE_NAME} (email)"
+        )
+    except mysql.connector.Error as err:
+        if err.errno != errorcode.ER_DUP_KEYNAME:
+            raise
+    finally:
+        cursor.close()
+
+def insert_data(connection, data, batch_size=BATCH_SIZE):
+    """
+    Inserts rows in chunks of `batch_size` with one executemany and one
+    commit per chunk. executemany sends each chunk as a single multi-row
+    INSERT, and INSERT IGNORE lets the unique email index drop duplicates
+    instead of checking each email with a SELECT.
+    Returns the number of rows inserted.
+    """
     cursor = connection.cursor()
-    select_query = f"SELECT user_id FROM {TABLE_NAME} WHERE email=%s"
-    insert_query = f"INSERT INTO {TABLE_NAME} (user_id, name, email, age) VALUES (%s, %s, %s, %s)"
-    for row in data:
-        cursor.execute(select_query, (row['email'],))
-        if cursor.fetchone():
-            continue  # Skip if email already exists
-        user_id = str(uuid.uuid4())
-        cursor.execute(insert_query, (user_id, row['name'], row['email'], row['age']))
-    connection.commit()
-    cursor.close()
-
-def read_csv(filename):
-    with open(filename, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        return [row for row in reader]
+    insert_query = (
+        f"INSERT IGNORE INTO {TABLE_NAME} (user_id, name, email, age) "
+        f"VALUES (%s, %s, %s, %s)"
+    )
+    inserted = 0
+    rows = iter(data)
+    try:
+        while True:
+            chunk = [
+                (str(uuid.uuid4()), row['name'], row['email'], row['age'])
+                for row in islice(rows, batch_size)
+            ]
+            if not chunk:
+                break
+            cursor.executemany(insert_query, chunk)
+            inserted += cursor.rowcount
+            connection.commit()
+    finally:
+        cursor.close()
+    return inserted
+
+def load_data_infile(connection, filename):
+    """
+    Bulk loads a CSV with LOAD DATA LOCAL INFILE into a staging table, then
+    moves new rows into user_data with a single INSERT IGNORE ... SELECT.
+    The connection must be opened with allow_local_infile=True.
+    Returns the number of rows inserted.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {STAGING_TABLE}")
+        cursor.execute(f"""
+        CREATE TEMPORARY TABLE {STAGING_TABLE} (
+            name VARCHAR(255) NOT NULL,
+            email VARCHAR(255) NOT NULL,
+            age DECIMAL NOT NULL
+        )
+        """)
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {STAGING_TABLE} "
+            f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            f"LINES TERMINATED BY '\\n' IGNORE 1 LINES (name, email, age)",
+            (filename,)
+        )
+        cursor.execute(
+            f"INSERT IGNORE INTO {TABLE_NAME} (user_id, name, email, age) "
+            f"SELECT UUID(), name, email, age FROM {STAGING_TABLE}"
+        )
+        inserted = cursor.rowcount
+        cursor.execute(f"DROP TEMPORARY TABLE {STAGING_TABLE}")
+        connection.commit()
+    finally:
+        cursor.close()
+    return inserted
+
+def _read_records(filename, offset=0, end=None):
+    """
+    Generator that parses the CSV from byte `offset` (0 means the first data
+    row) and yields (row, end_offset) pairs, where end_offset is the byte
+    position right after the row. Rows starting at or after byte `end` are
+    left out. Lines are read one at a time, so memory use does not grow
+    with the file.
+    """
+    with open(filename, 'rb') as csvfile:
+        header = next(csv.reader([csvfile.readline().decode('utf-8')]))
+        if offset > csvfile.tell():
+            csvfile.seek(offset)
+        while end is None or csvfile.tell() < end:
+            record = csvfile.readline()
+            if not record:
+                break
+            # A quoted field may span lines; keep reading until quotes balance
+            while record.count(b'"') % 2:
+                line = csvfile.readline()
+                if not line:
+                    break
+                record += line
+            values = next(csv.reader([record.decode('utf-8')]), None)
+            if values:
+                yield dict(zip(header, values)), csvfile.tell()
+
+def _convert(row):
+    """
+    Validates a CSV row and converts its fields to the column types.
+    Returns None for rows that cannot be inserted.
+    """
+    name = (row.get('name') or '').strip()
+    email = (row.get('email') or '').strip()
+    if not name or '@' not in email:
+        return None
+    try:
+        age = Decimal(row.get('age') or '')
+    except InvalidOperation:
+        return None
+    return {'name': name, 'email': email, 'age': age}
+
+def read_csv(filename, offset=0):
+    """
+    Generator that streams validated, type-converted rows from the CSV,
+    starting at byte `offset`. Invalid rows are skipped.
+    """
+    for row, _ in _read_records(filename, offset):
+        row = _convert(row)
+        if row is not None:
+            yield row
+
+def _checkpoint_path(filename, start=0):
+    if start:
+        return f"{filename}.{start}.offset"
+    return f"{filename}.offset"
+
+def _save_checkpoint(checkpoint, offset):
+    """Atomically records the byte offset of the last committed row."""
+    temp = f"{checkpoint}.tmp"
+    with open(temp, 'w') as f:
+        f.write(str(offset))
+    os.replace(temp, checkpoint)
+
+def ingest_csv(connection, filename, batch_size=BATCH_SIZE, resume=True,
+               start=0, end=None):
+    """
+    Streams the CSV into user_data in chunks of `batch_size` valid rows.
+    `start` and `end` restrict the load to a byte range of the file.
+    After each chunk is committed, the byte offset reached is saved to
+    "<filename>.offset". A crashed run then resumes from the last committed
+    chunk instead of starting over. The checkpoint is removed once the
+    whole file is loaded.
+    Returns the number of rows inserted.
+    """
+    checkpoint = _checkpoint_path(filename, start)
+    offset = start
+    if resume and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            offset = int(f.read() or 0)
+    inserted = 0
+    chunk = []
+    for row, end_offset in _read_records(filename, offset, end):
+        row = _convert(row)
+        if row is not None:
+            chunk.append(row)
+        if len(chunk) >= batch_size:
+            inserted += insert_data(connection, chunk, batch_size)
+            _save_checkpoint(checkpoint, end_offset)
+            chunk = []
+    if chunk:
+        inserted += insert_data(connection, chunk, batch_size)
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return inserted
+
+def split_csv(filename, parts):
+    """
+    Splits a CSV into `parts` byte ranges that each start on a line boundary.
+    Returns (start, end) pairs; end is None for the last range.
+    Assumes quoted fields do not contain newlines.
+    """
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as csvfile:
+        csvfile.readline()
+        starts = [csvfile.tell()]
+        for i in range(1, parts):
+            csvfile.seek(max(size * i // parts, starts[-1]))
+            csvfile.readline()
+            position = csvfile.tell()
+            if position >= size:
+                break
+            if position > starts[-1]:
+                starts.append(position)
+    return list(zip(starts, starts[1:] + [None]))
+
+def _seed_task(task):
+    """Worker entry point: loads one file or byte range on its own connection."""
+    filename, start, end = task
+    connection = connect_to_prodev()
+    try:
+        return ingest_csv(connection, filename, start=start, end=end)
+    finally:
+        connection.close()
+
+def seed_parallel(filenames, workers=None):
+    """
+    Seeds several CSV files (or byte ranges of one large file) in parallel.
+    Each worker process opens its own connection with connect_to_prodev.
+    Rows duplicated across workers are dropped by the unique email index.
+    Prints the aggregate throughput and returns the number of rows inserted.
+    """
+    workers = workers or os.cpu_count() or 1
+    parts = max(1, -(-workers // len(filenames)))
+    tasks = [
+        (filename, start, end)
+        for filename in filenames
+        for start, end in split_csv(filename, parts)
+    ]
+    start_time = time.perf_counter()
+    with Pool(min(workers, len(tasks))) as pool:
+        inserted = sum(pool.imap_unordered(_seed_task, tasks))
+    elapsed = time.perf_counter() - start_time
+    rate = inserted / elapsed if elapsed > 0 else 0
+    print(f"Inserted {inserted} rows from {len(filenames)} file(s) with "
+          f"{min(workers, len(tasks))} workers in {elapsed:.2f}s "
+          f"({rate:,.0f} rows/sec)")
+    return inserted
 
 if __name__ == "__main__":
     # Step 1: Connect to MySQL server
@@ -73,9 +293,23 @@ if __name__ == "__main__":
     # Step 2: Connect to ALX_prodev database
     conn = connect_to_prodev()
     create_table(conn)
+    ensure_email_index(conn)
 
     # Step 3: Read CSV and insert data
-    user_data = read_csv(CSV_FILE)
-    insert_data(conn, user_data)
-    conn.close()
+    # Usage: python seed.py [parallel 'user_data_*.csv' [workers]]
+    if sys.argv[1:2] == ['parallel']:
+        conn.close()
+        pattern = sys.argv[2] if len(sys.argv) > 2 else 'user_data_*.csv'
+        workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        filenames = sorted(glob.glob(pattern))
+        if not filenames:
+            sys.exit(f"No CSV files match {pattern}")
+        seed_parallel(filenames, workers)
+    else:
+        start = time.perf_counter()
+        inserted = ingest_csv(conn, CSV_FILE)
+        elapsed = time.perf_counter() - start
+        conn.close()
+        rate = inserted / elapsed if elapsed > 0 else 0
+        print(f"Inserted {inserted} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
     print("Database seeded successfully.")